@@ -35,15 +35,15 @@ class MoviesAPI:
 
         @self.socketio.on("load_movie_recommendations")
         def handle_load_recommendations():
-            self.socketio.emit("movie_recommendations", {"data": self.db.recommended_movies})
+            self.socketio.emit("movie_recommendations", {"data": self.db.recommended_movies, "cursor": self.db.recommended_movies_cursor, "request": self.db.recommended_movies_request})
 
         @self.socketio.on("refresh_movie_recommendations")
         def handle_refresh_movie_recommendations(data):
-            recommended_movies = self.db.refresh_recommendations(data)
+            recommended_movies, next_cursor = self.db.refresh_recommendations(data)
             if not len(recommended_movies):
                 self.socketio.emit("new_toast_msg", {"title": "No movies found", "message": "Check logs for more info"})
 
-            self.socketio.emit("movie_recommendations", {"data": recommended_movies})
+            self.socketio.emit("movie_recommendations", {"data": recommended_movies, "cursor": next_cursor})
 
         @self.socketio.on("add_movie_to_radarr")
         def handle_add_movie_to_radarr(movie_title, movie_year, tmdb_id):
@@ -34,11 +34,11 @@ class MusicAPI:
 
         @self.socketio.on("refresh_music_recommendations")
         def handle_refresh_music_recommendations(data):
-            recommended_artists = self.db.refresh_recommendations(data)
+            recommended_artists, next_cursor = self.db.refresh_recommendations(data)
             if not len(recommended_artists):
                 self.socketio.emit("new_toast_msg", {"title": "No artists found", "message": "Check logs for more info"})
 
-            self.socketio.emit("music_recommendations", {"data": recommended_artists})
+            self.socketio.emit("music_recommendations", {"data": recommended_artists, "cursor": next_cursor})
 
         @self.socketio.on("add_artist_to_lidarr")
         def handle_add_artist_to_lidarr(artist_name):
@@ -54,7 +54,7 @@ class MusicAPI:
 
         @self.socketio.on("load_music_recommendations")
         def handle_load_recommendations():
-            self.socketio.emit("music_recommendations", {"data": self.db.recommended_artists})
+            self.socketio.emit("music_recommendations", {"data": self.db.recommended_artists, "cursor": self.db.recommended_artists_cursor, "request": self.db.recommended_artists_request})
 
         @self.socketio.on("search_spotify")
         def handle_spotify_search(query_req):
@@ -85,5 +85,10 @@ class MusicAPI:
             logger.info(f"Request to cancel active download recieved")
             self.lidarr_service.get_wanted_albums_from_lidarr()
 
+        @self.socketio.on("stop_wanted_albums_from_lidarr")
+        def handle_stop_wanted_albums_from_lidarr():
+            logger.info(f"Request to stop reading wanted albums from Lidarr received")
+            self.lidarr_service.stop_wanted_albums_from_lidarr()
+
     def get_blueprint(self):
         return music_bp
@@ -13,7 +13,7 @@ tasks_bp = Blueprint("tasks", __name__)
 class TasksAPI:
     def __init__(self, socketio: SocketIO, config: Config, lidarr_service: LidarrService, radarr_service: RadarrService, readarr_service: ReadarrService, sonarr_service: SonarrService):
         self.socketio = socketio
-        self.tasks_manager = Tasks(config, lidarr_service, radarr_service, readarr_service, sonarr_service)
+        self.tasks_manager = Tasks(config, lidarr_service, radarr_service, readarr_service, sonarr_service, progress_callback=lambda progress: self.socketio.emit("task_progress", progress))
 
         self.setup_routes()
         self.setup_socket_events()
@@ -34,16 +34,7 @@ class TasksAPI:
             task = self.tasks_manager.get_task(task_id)
             if task:
                 try:
-                    task.status = "Running"
-                    self.socketio.emit("update_task", task.to_dict())
-
-                    self.tasks_manager.scheduler.add_job(
-                        func=self.tasks_manager.run_task,
-                        trigger="date",
-                        id=f"task_{task_id}",
-                        replace_existing=True,
-                        kwargs={"task_id": task_id},
-                    )
+                    self.tasks_manager.start_task(task_id)
 
                     task_list = self.tasks_manager.list_tasks()
                     self.socketio.emit("load_task_data", task_list)
@@ -55,15 +46,15 @@ class TasksAPI:
 
         @self.socketio.on("task_stop")
         def handle_stop(task_id):
-            """Stop a running task (removes from scheduler)."""
+            """Cancel the running or queued run of a task, leaving its schedule in place."""
             task = self.tasks_manager.get_task(task_id)
             if task:
-                task.status = "Stopped"
-                job = self.tasks_manager.scheduler.get_job(f"task_{task_id}")
-                if job:
-                    job.remove()
-                self.tasks_manager.save_tasks()
-                self.socketio.emit("update_task", task.to_dict())
+                if self.tasks_manager.stop_task(task_id):
+                    task.status = "Stopping"
+                    self.tasks_manager.save_tasks()
+                    self.socketio.emit("update_task", task.to_dict())
+                else:
+                    self.socketio.emit("new_toast_msg", {"title": "Task not running", "message": f"{task.name} has no active run to stop"})
 
         @self.socketio.on("task_disable")
         def handle_disable(task_id):
@@ -88,18 +79,32 @@ class TasksAPI:
 
         @self.socketio.on("request_tasks")
         def handle_request_tasks():
-            """Emit a list of all tasks to the client."""
+            """Emit a list of all tasks to the client, followed by the progress of any running ones."""
             task_list = self.tasks_manager.list_tasks()
             self.socketio.emit("load_task_data", task_list)
+            for progress in self.tasks_manager.list_progress():
+                self.socketio.emit("task_progress", progress)
+
+        @self.socketio.on("request_task_stats")
+        def handle_request_task_stats():
+            """Emit run duration and throughput percentiles and trends for every task."""
+            self.socketio.emit("load_task_stats", self.tasks_manager.get_run_stats())
+
+        @self.socketio.on("request_task_history")
+        def handle_request_task_history(task_id):
+            """Emit the latest recorded runs of a task."""
+            task = self.tasks_manager.get_task(task_id)
+            if task:
+                self.socketio.emit("load_task_history", {"task_id": task_id, "runs": self.tasks_manager.get_run_history(task_id)})
 
         @self.socketio.on("update_task_cron")
         def handle_update_task_cron(data):
-            """Update a task's cron expression."""
+            """Update a task's cron expression; an empty one leaves the task to run after its dependencies."""
             task_id = data.get("taskId")
             new_cron = data.get("newCron")
 
-            if task_id and new_cron:
-                self.tasks_manager.update_task_cron(task_id, new_cron)
+            if task_id and new_cron is not None:
+                self.tasks_manager.update_task_cron(task_id, new_cron.strip())
 
                 task = self.tasks_manager.get_task(task_id)
                 if task:
@@ -1,3 +1,13 @@
 from sqlalchemy.ext.declarative import declarative_base
+from utils.string_cleaner import name_key
 
 Base = declarative_base()
+
+
+def name_key_default(source_column):
+    """Column default that fills a normalised lookup key from another column of the row being inserted."""
+
+    def default(context):
+        return name_key(context.get_current_parameters().get(source_column))
+
+    return default
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+from db.cache_models import ArtistImageCache, LastFMArtistCache
+from db.database_handler import DatabaseHandler
+from logger import logger
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from utils.string_cleaner import name_key
+
+
+class CacheDBHandler(DatabaseHandler):
+    def __init__(self, ttl_days=30, max_entries=50000, image_ttl_days=90, image_negative_ttl_days=7):
+        super().__init__()
+        self.ttl = timedelta(days=ttl_days)
+        self.max_entries = max_entries
+        self.image_ttl = timedelta(days=image_ttl_days)
+        self.image_negative_ttl = timedelta(days=image_negative_ttl_days)
+
+    def get_lastfm_artist(self, artist_name):
+        """Return cached Last.fm metadata for an artist, or None if missing or expired."""
+        session = self.SessionLocal()
+        try:
+            cached = session.query(LastFMArtistCache).filter(LastFMArtistCache.name_key == name_key(artist_name)).first()
+
+            if cached and cached.fetched_at >= datetime.now() - self.ttl:
+                return cached.as_dict()
+
+            return None
+
+        except Exception as e:
+            logger.error(f"Error reading LastFM cache for '{artist_name}': {str(e)}")
+            return None
+
+        finally:
+            session.close()
+
+    def store_lastfm_artist(self, artist_name, metadata):
+        """Insert or refresh the cached Last.fm metadata for an artist."""
+        session = self.SessionLocal()
+        try:
+            values = {
+                "name_key": name_key(artist_name),
+                "name": artist_name,
+                "genre": metadata.get("genre"),
+                "listeners": metadata.get("listeners"),
+                "play_count": metadata.get("play_count"),
+                "overview": metadata.get("overview"),
+                "fetched_at": datetime.now(),
+            }
+            statement = insert(LastFMArtistCache).values(**values)
+            statement = statement.on_conflict_do_update(index_elements=[LastFMArtistCache.name_key], set_={key: value for key, value in values.items() if key != "name_key"})
+            session.execute(statement)
+            session.commit()
+
+        except Exception as e:
+            logger.error(f"Error writing LastFM cache for '{artist_name}': {str(e)}")
+            session.rollback()
+
+        finally:
+            session.close()
+
+    def evict_lastfm_artists(self):
+        """Remove expired entries, then the oldest entries beyond the size limit."""
+        session = self.SessionLocal()
+        try:
+            expired_count = session.query(LastFMArtistCache).filter(LastFMArtistCache.fetched_at < datetime.now() - self.ttl).delete(synchronize_session=False)
+
+            overflow_count = 0
+            total_count = session.query(LastFMArtistCache).count()
+            if total_count > self.max_entries:
+                oldest_ids = select(LastFMArtistCache.id).order_by(LastFMArtistCache.fetched_at.asc()).limit(total_count - self.max_entries)
+                overflow_count = session.query(LastFMArtistCache).filter(LastFMArtistCache.id.in_(oldest_ids)).delete(synchronize_session=False)
+
+            session.commit()
+            logger.debug(f"LastFM cache eviction: {expired_count} expired, {overflow_count} over limit.")
+
+        except Exception as e:
+            logger.error(f"Error evicting LastFM cache: {str(e)}")
+            session.rollback()
+
+        finally:
+            session.close()
+
+    def get_artist_images(self, artist_names):
+        """Return {name_key: image} for every fresh cache entry, where image is None for a cached miss."""
+        session = self.SessionLocal()
+        try:
+            keys = {name_key(artist_name) for artist_name in artist_names}
+            now = datetime.now()
+            found = {}
+            for cached in session.query(ArtistImageCache).filter(ArtistImageCache.name_key.in_(keys)).all():
+                ttl = self.image_ttl if cached.image else self.image_negative_ttl
+                if cached.fetched_at >= now - ttl:
+                    found[cached.name_key] = cached.image
+
+            return found
+
+        except Exception as e:
+            logger.error(f"Error reading artist image cache: {str(e)}")
+            return {}
+
+        finally:
+            session.close()
+
+    def store_artist_images(self, artist_images):
+        """Insert or refresh cached images from a {name: image} dict, storing None for artists with no image."""
+        if not artist_images:
+            return
+
+        session = self.SessionLocal()
+        try:
+            now = datetime.now()
+            rows = {name_key(artist_name): {"name_key": name_key(artist_name), "image": image, "fetched_at": now} for artist_name, image in artist_images.items()}
+            statement = insert(ArtistImageCache)
+            statement = statement.on_conflict_do_update(index_elements=[ArtistImageCache.name_key], set_={"image": statement.excluded.image, "fetched_at": statement.excluded.fetched_at})
+            session.execute(statement, list(rows.values()))
+            session.commit()
+
+        except Exception as e:
+            logger.error(f"Error writing artist image cache: {str(e)}")
+            session.rollback()
+
+        finally:
+            session.close()
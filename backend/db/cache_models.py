@@ -0,0 +1,33 @@
+from db.base import Base
+from sqlalchemy import Column, DateTime, Integer, String
+
+
+class LastFMArtistCache(Base):
+    __tablename__ = "lastfm_artist_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name_key = Column(String, unique=True, index=True)
+    name = Column(String)
+    genre = Column(String)
+    listeners = Column(Integer)
+    play_count = Column(Integer)
+    overview = Column(String)
+    fetched_at = Column(DateTime, index=True)
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "genre": self.genre,
+            "listeners": self.listeners,
+            "play_count": self.play_count,
+            "overview": self.overview,
+        }
+
+
+class ArtistImageCache(Base):
+    __tablename__ = "artist_image_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name_key = Column(String, unique=True, index=True)
+    image = Column(String, nullable=True)
+    fetched_at = Column(DateTime, index=True)
@@ -0,0 +1,196 @@
+import time
+
+from db.database_handler import DatabaseHandler
+from logger import logger
+from sqlalchemy import exists, func, insert, select, text, update
+from utils.pagination import SHUFFLE_KEY_BITS, SHUFFLE_SESSION_IDLE_SECONDS, decode_cursor, encode_cursor, shuffle_start_key
+from utils.result_cache import ResultCache
+
+
+class CatalogDBHandler(DatabaseHandler):
+    """Shared storage of a recommendation catalog: library syncs, seed edges, shuffled paging, reshuffles and scores.
+
+    Subclasses describe their tables by setting catalog_model, tag_column, library_model, library_match, edge_model,
+    edge_seed_column, edge_catalog_column, popularity_column, card_columns and label in __init__.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.result_cache = ResultCache()
+        self.batch_size = 500
+        self.last_shuffle_request = None
+        self.reshuffle_pending = False
+
+    def _batches(self, items):
+        for index in range(0, len(items), self.batch_size):
+            yield items[index : index + self.batch_size]
+
+    def _seed_tag(self, seed_key):
+        return f"seed:{seed_key}"
+
+    def _apply_library_diff(self, session, library_name, rows_to_add, rows_to_update, ids_to_remove, timings):
+        """Write a library diff and refresh the in-library flags of the catalog, then commit and return the sync summary."""
+        started = time.perf_counter()
+        for batch in self._batches(rows_to_add):
+            session.execute(insert(self.library_model), batch)
+        timings["insert"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        if rows_to_update:
+            session.execute(update(self.library_model), rows_to_update)
+        timings["update"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for batch in self._batches(ids_to_remove):
+            session.query(self.edge_model).filter(self.edge_seed_column.in_(batch)).delete(synchronize_session=False)
+            session.query(self.library_model).filter(self.library_model.id.in_(batch)).delete(synchronize_session=False)
+        if ids_to_remove:
+            session.query(self.catalog_model).filter(~self._has_seed()).delete(synchronize_session=False)
+        timings["delete"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        catalog_column, library_column = self.library_match
+        owned = catalog_column.in_(select(library_column))
+        flagged_count = session.execute(
+            update(self.catalog_model).where(self.catalog_model.in_library.is_not(owned)).values(in_library=owned).execution_options(synchronize_session=False)
+        ).rowcount
+        timings["library"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        session.commit()
+        timings["commit"] = time.perf_counter() - started
+        self.result_cache.clear()
+
+        timing_summary = ", ".join(f"{step} {duration:.3f}s" for step, duration in timings.items())
+        logger.info(f"{library_name} sync: {len(rows_to_add)} added, {len(rows_to_update)} updated, {len(ids_to_remove)} removed, {flagged_count} recommendations changed library membership ({timing_summary})")
+        return {"added": len(rows_to_add), "updated": len(rows_to_update), "removed": len(ids_to_remove), "timings": timings}
+
+    def _has_seed(self):
+        return exists().where(self.edge_catalog_column == self.catalog_model.id)
+
+    def _unlink_stale_edges(self, session, seed_id, stale_ids):
+        """Delete a seed's edges to the given catalog rows, and the rows no other seed recommends; returns their cache tags."""
+        if not stale_ids:
+            return set()
+        stale_tags = {tag for (tag,) in session.query(self.tag_column).filter(self.catalog_model.id.in_(stale_ids)).all()}
+        session.query(self.edge_model).filter(self.edge_seed_column == seed_id, self.edge_catalog_column.in_(stale_ids)).delete(synchronize_session=False)
+        session.query(self.catalog_model).filter(self.catalog_model.id.in_(stale_ids), ~self._has_seed()).delete(synchronize_session=False)
+        return stale_tags
+
+    def _invalidate_stored_seed(self, seed_key, changed_tags):
+        # New rows only show up in cached pages after the clear at the end of the run, when scores and shuffle keys are refreshed.
+        for tag in set(changed_tags) | {self._seed_tag(seed_key)}:
+            self.result_cache.invalidate_tag(tag)
+
+    def _note_shuffle_request(self, cursor):
+        """Record a shuffled page request, applying a deferred reshuffle when it starts a new shuffle session."""
+        if cursor is None:
+            self.last_shuffle_request = None
+            if self.reshuffle_pending:
+                self.reshuffle_recommendations()
+        self.last_shuffle_request = time.monotonic()
+
+    def _card_query(self, session):
+        """Column-only query for cards and the keys used to page them, skipping dismissed rows and those already in the library."""
+        model = self.catalog_model
+        return session.query(*self.card_columns, self.tag_column, model.shuffle_key, model.score).filter(model.dismissed.is_(False), model.in_library.is_(False))
+
+    def _get_shuffled_page(self, filters, num_results=10, seed=None, cursor=None):
+        """Walk the shuffle key index from a seeded start point, wrapping around once, so each page costs O(page size) and never repeats."""
+        model = self.catalog_model
+        position = decode_cursor(cursor) or {"start": shuffle_start_key(seed), "after": None, "wrapped": False}
+        session = self.SessionLocal()
+        try:
+            results = []
+            while len(results) < num_results:
+                query = self._card_query(session).filter(*filters)
+                if position["wrapped"]:
+                    query = query.filter(model.shuffle_key < position["start"])
+                else:
+                    query = query.filter(model.shuffle_key >= position["start"])
+                if position["after"] is not None:
+                    query = query.filter(model.shuffle_key > position["after"])
+
+                rows = query.order_by(model.shuffle_key, model.id).limit(num_results).all()
+                for row in rows:
+                    if row.shuffle_key == position["after"]:
+                        continue
+                    results.append(row)
+                    position["after"] = row.shuffle_key
+                    if len(results) == num_results:
+                        break
+
+                if len(rows) < num_results and len(results) < num_results:
+                    if position["wrapped"]:
+                        position = None
+                        break
+                    position.update({"after": None, "wrapped": True})
+
+            logger.debug(f"Retrieved {len(results)} shuffled {self.label}")
+            return results, encode_cursor(position)
+
+        except Exception as e:
+            logger.error(f"Error retrieving shuffled {self.label}: {str(e)}")
+            return [], None
+
+        finally:
+            session.close()
+
+    def reshuffle_recommendations(self):
+        """Give every catalog row a new random shuffle position, deferred to the next shuffle session while one is open."""
+        if self.last_shuffle_request is not None and time.monotonic() - self.last_shuffle_request < SHUFFLE_SESSION_IDLE_SECONDS:
+            self.reshuffle_pending = True
+            logger.info(f"Shuffle session open, reshuffling recommended {self.label} when the next one starts")
+            return
+
+        session = self.SessionLocal()
+        try:
+            reshuffled_count = session.execute(update(self.catalog_model).values(shuffle_key=func.random().op("&")((1 << SHUFFLE_KEY_BITS) - 1))).rowcount
+            session.commit()
+            self.reshuffle_pending = False
+            self.result_cache.clear()
+            logger.info(f"Reshuffled {reshuffled_count} recommended {self.label}")
+
+        except Exception as e:
+            logger.error(f"Error reshuffling recommended {self.label}: {str(e)}")
+            session.rollback()
+
+        finally:
+            session.close()
+
+    def score_recommendations(self, seed_weight, similarity_weight, popularity_weight):
+        """Score every catalog row from its seed count, mean similarity and popularity percentile in one set-based update."""
+        catalog_table = self.catalog_model.__tablename__
+        session = self.SessionLocal()
+        try:
+            started = time.perf_counter()
+            scored_count = session.execute(
+                text(
+                    f"""
+                    UPDATE {catalog_table} SET score = scored.score
+                    FROM (
+                        SELECT edge_stats.id,
+                            :seed_weight * edge_stats.seed_count * 1.0 / MAX(edge_stats.seed_count) OVER ()
+                            + :similarity_weight * edge_stats.similarity
+                            + :popularity_weight * PERCENT_RANK() OVER (ORDER BY candidate.{self.popularity_column.key}) AS score
+                        FROM (
+                            SELECT {self.edge_catalog_column.key} AS id, COUNT(*) AS seed_count, AVG(COALESCE(similarity_score, 0)) AS similarity
+                            FROM {self.edge_model.__tablename__} GROUP BY {self.edge_catalog_column.key}
+                        ) AS edge_stats
+                        JOIN {catalog_table} AS candidate ON candidate.id = edge_stats.id
+                    ) AS scored
+                    WHERE {catalog_table}.id = scored.id
+                    """
+                ),
+                {"seed_weight": seed_weight, "similarity_weight": similarity_weight, "popularity_weight": popularity_weight},
+            ).rowcount
+            session.commit()
+            self.result_cache.clear()
+            logger.info(f"Scored {scored_count} recommended {self.label} in {time.perf_counter() - started:.3f}s")
+
+        except Exception as e:
+            logger.error(f"Error scoring recommended {self.label}: {str(e)}")
+            session.rollback()
+
+        finally:
+            session.close()
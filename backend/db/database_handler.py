@@ -1,16 +1,70 @@
+import threading
+
+from db import cache_models, movie_models, music_models, task_models, user_model  # noqa: F401
 from db.base import Base
+from db.migrations import run_migrations
 from logger import logger
 from services.config_services import DB_URL
-from sqlalchemy import create_engine, func
+from sqlalchemy import create_engine, event, func, inspect
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 
+# One gevent worker serves every Socket.IO handler, so the pool covers the concurrent greenlets plus the scheduler, generation and SpotDL threads.
+POOL_SIZE = 10
+POOL_MAX_OVERFLOW = 20
+POOL_TIMEOUT_SECONDS = 30
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": 30000,
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "mmap_size": 268435456,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+    finally:
+        cursor.close()
+
+
+def get_engine(db_url=DB_URL):
+    """Return the process-wide engine and session factory for a database URL, creating the schema on first use."""
+    with _engines_lock:
+        if db_url not in _engines:
+            url = make_url(db_url)
+            engine_options = {}
+            if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+                engine_options = {
+                    "connect_args": {"check_same_thread": False, "timeout": SQLITE_PRAGMAS["busy_timeout"] / 1000},
+                    "pool_size": POOL_SIZE,
+                    "max_overflow": POOL_MAX_OVERFLOW,
+                    "pool_timeout": POOL_TIMEOUT_SECONDS,
+                    "pool_pre_ping": True,
+                }
+
+            engine = create_engine(db_url, **engine_options)
+            if url.get_backend_name() == "sqlite":
+                event.listen(engine, "connect", _apply_sqlite_pragmas)
+
+            run_migrations(engine, new_database=not inspect(engine).get_table_names())
+            Base.metadata.create_all(engine)
+            _engines[db_url] = (engine, sessionmaker(autocommit=False, autoflush=False, bind=engine))
+            logger.info(f"Database engine ready for {url.render_as_string(hide_password=True)}")
+
+        return _engines[db_url]
+
 
 class DatabaseHandler:
     def __init__(self, db_url=DB_URL):
         try:
-            self.engine = create_engine(db_url)
-            Base.metadata.create_all(self.engine)
-            self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+            self.engine, self.SessionLocal = get_engine(db_url)
 
         except Exception as e:
             logger.error(f"Error in DB Handler: {str(e)}")
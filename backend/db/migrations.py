@@ -0,0 +1,218 @@
+from db.movie_models import MovieRecommendation, RecommendedMovie
+from db.music_models import ArtistRecommendation, RecommendedArtist
+from logger import logger
+from sqlalchemy import text
+from utils.pagination import random_shuffle_key
+from utils.string_cleaner import name_key
+
+
+def _table_exists(connection, table_name):
+    return connection.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :table_name"), {"table_name": table_name}).first() is not None
+
+
+def _column_names(connection, table_name):
+    return {row[1] for row in connection.execute(text(f"PRAGMA table_info({table_name})")).fetchall()}
+
+
+def _create_index(connection, index_name, table_name, columns, unique=False):
+    if not _table_exists(connection, table_name):
+        return
+    unique_clause = "UNIQUE " if unique else ""
+    connection.execute(text(f"CREATE {unique_clause}INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(columns)})"))
+
+
+def _add_column(connection, table_name, column_name, column_type):
+    if not _table_exists(connection, table_name):
+        return
+    if column_name not in _column_names(connection, table_name):
+        connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+
+
+def _create_model_indexes(connection, model, name_prefix):
+    for index in model.__table__.indexes:
+        if index.name.startswith(name_prefix):
+            _create_index(connection, index.name, model.__tablename__, [column.name for column in index.columns])
+
+
+def _index_recommendation_seeds(connection):
+    _create_index(connection, "ix_recommended_artists_lidarr_artist_id", "recommended_artists", ["lidarr_artist_id"])
+    _create_index(connection, "ix_recommended_movies_radarr_movie_id", "recommended_movies", ["radarr_movie_id"])
+
+
+def _track_recommendation_generation_time(connection):
+    _add_column(connection, "lidarr_artists", "recommendations_generated_at", "DATETIME")
+    _add_column(connection, "radarr_movies", "recommendations_generated_at", "DATETIME")
+    _create_index(connection, "ix_lidarr_artists_recommendations_generated_at", "lidarr_artists", ["recommendations_generated_at"])
+    _create_index(connection, "ix_radarr_movies_recommendations_generated_at", "radarr_movies", ["recommendations_generated_at"])
+
+
+def _key_radarr_movies_on_tmdb_id(connection):
+    if not _table_exists(connection, "radarr_movies"):
+        return
+    connection.execute(text("UPDATE radarr_movies SET tmdb_id = NULL WHERE tmdb_id = 0"))
+    duplicate_ids = "SELECT id FROM radarr_movies WHERE tmdb_id IS NOT NULL AND id NOT IN (SELECT MIN(id) FROM radarr_movies WHERE tmdb_id IS NOT NULL GROUP BY tmdb_id)"
+    if "radarr_movie_id" in _column_names(connection, "recommended_movies"):
+        connection.execute(text(f"DELETE FROM recommended_movies WHERE radarr_movie_id IN ({duplicate_ids})"))
+    connection.execute(text(f"DELETE FROM radarr_movies WHERE id IN ({duplicate_ids})"))
+    connection.execute(text("DROP INDEX IF EXISTS ix_radarr_movies_title"))
+    _create_index(connection, "ix_radarr_movies_title", "radarr_movies", ["title"])
+    _create_index(connection, "ix_radarr_movies_tmdb_id", "radarr_movies", ["tmdb_id"], unique=True)
+
+
+def _add_normalised_key_columns(connection):
+    for table_name, source_column, key_column in [
+        ("lidarr_artists", "name", "name_key"),
+        ("recommended_artists", "name", "name_key"),
+        ("dismissed_artists", "name", "name_key"),
+        ("radarr_movies", "title", "title_key"),
+        ("recommended_movies", "title", "title_key"),
+        ("dismissed_movies", "title", "title_key"),
+    ]:
+        if not _table_exists(connection, table_name):
+            continue
+        _add_column(connection, table_name, key_column, "VARCHAR")
+        rows = connection.execute(text(f"SELECT id, {source_column} FROM {table_name}")).fetchall()
+        if rows:
+            connection.execute(text(f"UPDATE {table_name} SET {key_column} = :key WHERE id = :id"), [{"id": row_id, "key": name_key(value)} for row_id, value in rows])
+        _create_index(connection, f"ix_{table_name}_{key_column}", table_name, [key_column])
+
+
+def _add_shuffle_keys(connection):
+    for table_name, key_column in [("recommended_artists", "name_key"), ("recommended_movies", "title_key")]:
+        if not _table_exists(connection, table_name):
+            continue
+        _add_column(connection, table_name, "shuffle_key", "INTEGER")
+        keys = [key for (key,) in connection.execute(text(f"SELECT DISTINCT {key_column} FROM {table_name}")).fetchall()]
+        if keys:
+            connection.execute(text(f"UPDATE {table_name} SET shuffle_key = :shuffle_key WHERE {key_column} = :key"), [{"key": key, "shuffle_key": random_shuffle_key()} for key in keys])
+        _create_index(connection, f"ix_{table_name}_shuffle_key", table_name, ["shuffle_key"])
+
+
+def _index_keyset_sort_columns(connection):
+    _create_index(connection, "ix_recommended_artists_play_count_name_key", "recommended_artists", ["play_count", "name_key"])
+    _create_index(connection, "ix_recommended_artists_listeners_name_key", "recommended_artists", ["listeners", "name_key"])
+    _create_index(connection, "ix_recommended_movies_popularity_title_key", "recommended_movies", ["popularity", "title_key"])
+    _create_index(connection, "ix_recommended_movies_vote_average_title_key", "recommended_movies", ["vote_average", "title_key"])
+
+
+def _rebuild_as_catalog(connection, model, edge_model, seed_column, candidate_column, group_column):
+    table_name = model.__tablename__
+    existing_columns = _column_names(connection, table_name)
+    if seed_column not in existing_columns:
+        return
+
+    connection.execute(text(f"DROP TABLE IF EXISTS {edge_model.__tablename__}"))
+    index_names = connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table_name AND sql IS NOT NULL"), {"table_name": table_name}).fetchall()
+    for (index_name,) in index_names:
+        connection.execute(text(f"DROP INDEX {index_name}"))
+    connection.execute(text(f"ALTER TABLE {table_name} RENAME TO {table_name}_old"))
+    model.__table__.create(connection)
+    edge_model.__table__.create(connection)
+
+    catalog_columns = ", ".join(column.name for column in model.__table__.columns if column.name in existing_columns and column.name != "status")
+    connection.execute(
+        text(
+            f"INSERT INTO {table_name} ({catalog_columns}, status) "
+            f"SELECT {catalog_columns}, (SELECT MAX(status) FROM {table_name}_old AS duplicate WHERE duplicate.{group_column} = latest.{group_column}) "
+            f"FROM {table_name}_old AS latest WHERE id IN (SELECT MAX(id) FROM {table_name}_old WHERE {group_column} IS NOT NULL GROUP BY {group_column})"
+        )
+    )
+    connection.execute(
+        text(
+            f"INSERT OR IGNORE INTO {edge_model.__tablename__} ({seed_column}, {candidate_column}) "
+            f"SELECT old.{seed_column}, catalog.id FROM {table_name}_old AS old JOIN {table_name} AS catalog ON catalog.{group_column} = old.{group_column} "
+            f"WHERE old.{seed_column} IS NOT NULL"
+        )
+    )
+    connection.execute(text(f"DROP TABLE {table_name}_old"))
+
+
+def _split_recommendations_into_catalog_and_edges(connection):
+    _rebuild_as_catalog(connection, RecommendedArtist, ArtistRecommendation, "lidarr_artist_id", "recommended_artist_id", "name_key")
+    _rebuild_as_catalog(connection, RecommendedMovie, MovieRecommendation, "radarr_movie_id", "recommended_movie_id", "tmdb_id")
+
+
+def _add_recommendation_scores(connection):
+    _add_column(connection, "recommended_artists", "score", "FLOAT DEFAULT 0")
+    _add_column(connection, "recommended_movies", "score", "FLOAT DEFAULT 0")
+    _create_index(connection, "ix_recommended_artists_score_name_key", "recommended_artists", ["score", "name_key"])
+    _create_index(connection, "ix_recommended_movies_score_id", "recommended_movies", ["score", "id"])
+
+
+def _flag_dismissed_recommendations(connection):
+    for model, dismissed_table, key_column, old_indexes in [
+        (RecommendedArtist, "dismissed_artists", "name_key", ["play_count_name_key", "listeners_name_key", "score_name_key", "shuffle_key"]),
+        (RecommendedMovie, "dismissed_movies", "title_key", ["popularity_title_key", "vote_average_title_key", "popularity_id", "vote_average_id", "score_id", "shuffle_key"]),
+    ]:
+        table_name = model.__tablename__
+        if not _table_exists(connection, table_name):
+            continue
+        _add_column(connection, table_name, "dismissed", "BOOLEAN DEFAULT 0")
+        if _table_exists(connection, dismissed_table):
+            connection.execute(text(f"UPDATE {table_name} SET dismissed = {key_column} IN (SELECT {key_column} FROM {dismissed_table})"))
+        else:
+            connection.execute(text(f"UPDATE {table_name} SET dismissed = 0"))
+
+        for index_suffix in old_indexes:
+            connection.execute(text(f"DROP INDEX IF EXISTS ix_{table_name}_{index_suffix}"))
+        _create_model_indexes(connection, model, f"ix_{table_name}_dismissed_")
+
+
+def _flag_recommendations_in_library(connection):
+    for model, library_table, match_column in [(RecommendedArtist, "lidarr_artists", "name_key"), (RecommendedMovie, "radarr_movies", "tmdb_id")]:
+        table_name = model.__tablename__
+        if not _table_exists(connection, table_name):
+            continue
+        _add_column(connection, table_name, "in_library", "BOOLEAN DEFAULT 0")
+        if _table_exists(connection, library_table):
+            connection.execute(text(f"UPDATE {table_name} SET in_library = {match_column} IN (SELECT {match_column} FROM {library_table} WHERE {match_column} IS NOT NULL)"))
+        else:
+            connection.execute(text(f"UPDATE {table_name} SET in_library = 0"))
+
+        dismissed_indexes = connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE :pattern"), {"pattern": f"ix_{table_name}_dismissed_%"}).fetchall()
+        for (index_name,) in dismissed_indexes:
+            connection.execute(text(f"DROP INDEX {index_name}"))
+        _create_model_indexes(connection, model, f"ix_{table_name}_visible_")
+
+
+def _backfill_recommendation_scores(connection):
+    for table_name in ["recommended_artists", "recommended_movies"]:
+        if _table_exists(connection, table_name) and "score" in _column_names(connection, table_name):
+            connection.execute(text(f"UPDATE {table_name} SET score = 0 WHERE score IS NULL"))
+
+
+MIGRATIONS = [
+    (1, "Index recommendation seed foreign keys", _index_recommendation_seeds),
+    (2, "Track when recommendations were generated for each seed", _track_recommendation_generation_time),
+    (3, "Key Radarr movies on TMDB ID instead of title", _key_radarr_movies_on_tmdb_id),
+    (4, "Add indexed normalised name keys for case-insensitive lookups", _add_normalised_key_columns),
+    (5, "Add shuffle keys for random recommendation browsing", _add_shuffle_keys),
+    (6, "Index recommendation sort columns for keyset pagination", _index_keyset_sort_columns),
+    (7, "Store each recommended artist and movie once, linked to seeds through edge tables", _split_recommendations_into_catalog_and_edges),
+    (8, "Store an aggregated score for each recommended artist and movie", _add_recommendation_scores),
+    (9, "Flag dismissed recommendations so pages filter on an indexed column", _flag_dismissed_recommendations),
+    (10, "Flag recommendations that are already in the Lidarr or Radarr library", _flag_recommendations_in_library),
+    (11, "Give recommendations without a score the default score of 0", _backfill_recommendation_scores),
+]
+
+
+def run_migrations(engine, new_database=False):
+    """Apply schema changes that create_all cannot make to existing tables, tracked with PRAGMA user_version.
+
+    Migrations run before create_all and skip tables that do not exist yet, since create_all then builds those at the latest schema.
+    A database created from scratch is only stamped with the latest version.
+    """
+    with engine.begin() as connection:
+        if new_database:
+            connection.execute(text(f"PRAGMA user_version = {MIGRATIONS[-1][0]}"))
+            return
+
+        current_version = connection.execute(text("PRAGMA user_version")).scalar() or 0
+
+        for version, description, migration in MIGRATIONS:
+            if version <= current_version:
+                continue
+
+            logger.info(f"Applying database migration {version}: {description}")
+            migration(connection)
+            connection.execute(text(f"PRAGMA user_version = {version}"))
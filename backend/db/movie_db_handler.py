@@ -1,15 +1,54 @@
+import time
 import urllib.parse
+from datetime import datetime
 
-from db.database_handler import DatabaseHandler
-from db.movie_models import DismissedMovie, RadarrMovie, RecommendedMovie
+from db.catalog_db_handler import CatalogDBHandler
+from db.movie_models import DismissedMovie, MovieRecommendation, RadarrMovie, RecommendedMovie
 from logger import logger
-from sqlalchemy import func
+from sqlalchemy import exists
+from utils.pagination import keyset_page
+from utils.result_cache import ResultCache
+from utils.string_cleaner import name_key
 
 
-class MovieDBHandler(DatabaseHandler):
+class MovieDBHandler(CatalogDBHandler):
     def __init__(self):
         super().__init__()
         self.recommended_movies = []
+        self.recommended_movies_cursor = None
+        self.recommended_movies_request = {}
+        self.label = "movies"
+        self.catalog_model = RecommendedMovie
+        self.tag_column = RecommendedMovie.title_key
+        self.library_model = RadarrMovie
+        self.library_match = (RecommendedMovie.tmdb_id, RadarrMovie.tmdb_id)
+        self.edge_model = MovieRecommendation
+        self.edge_seed_column = MovieRecommendation.radarr_movie_id
+        self.edge_catalog_column = MovieRecommendation.recommended_movie_id
+        self.popularity_column = RecommendedMovie.popularity
+        self.sort_columns = {
+            "pop-desc": (RecommendedMovie.popularity, True),
+            "pop-asc": (RecommendedMovie.popularity, False),
+            "average-vote-desc": (RecommendedMovie.vote_average, True),
+            "average-vote-asc": (RecommendedMovie.vote_average, False),
+            "score": (RecommendedMovie.score, True),
+        }
+        self.card_columns = [
+            RecommendedMovie.id,
+            RecommendedMovie.title,
+            RecommendedMovie.genres,
+            RecommendedMovie.original_language,
+            RecommendedMovie.popularity,
+            RecommendedMovie.vote_average,
+            RecommendedMovie.vote_count,
+            RecommendedMovie.first_air_date,
+            RecommendedMovie.year,
+            RecommendedMovie.tmdb_id,
+            RecommendedMovie.image,
+            RecommendedMovie.overview,
+            RecommendedMovie.status,
+        ]
+        self.card_fields = [column.key for column in self.card_columns]
 
     def get_existing_db_movies(self):
         """Retrieve all movie data from the database."""
@@ -25,199 +64,257 @@ class MovieDBHandler(DatabaseHandler):
         finally:
             return movies
 
-    def add_radarr_movies(self, radarr_movies):
+    def get_radarr_movies_without_recommendations(self):
+        """Retrieve movie data for Radarr movies that have never had recommendations generated."""
+        movies = []
+        session = self.SessionLocal()
         try:
-            """Add new movies from Radarr if they are not already in the database."""
-            movie_items_in_db = self.get_existing_db_movies()
-            movies_in_db = {movie["title"].lower() for movie in movie_items_in_db}
-            new_movies_count = 0
+            has_recommendations = exists().where(MovieRecommendation.radarr_movie_id == RadarrMovie.id)
+            movies = [movie.as_dict() for movie in session.query(RadarrMovie).filter(~has_recommendations, RadarrMovie.recommendations_generated_at.is_(None)).all()]
 
-            for movie in radarr_movies:
-                movie_title = movie["title"].strip().lower()
-                if movie_title not in movies_in_db:
-                    movie_data = {
-                        "title": movie["title"].strip(),
-                        "genres": ", ".join(str(item) for item in movie.get("genres", [])),
-                        "tmdb_id": movie.get("tmdbId", 0),
-                    }
-                    self.store_movie(movie_data)
-                    new_movies_count += 1
-                else:
-                    logger.debug(f"Skipping existing movie: {movie_title}")
-
-            logger.debug(f"Added {new_movies_count} new movies.")
+        except Exception as e:
+            logger.error(f"Error Getting Radarr Movies Without Recommendations: {str(e)}")
+
+        finally:
+            session.close()
+            return movies
+
+    def get_stalest_radarr_movies(self, limit):
+        """Retrieve movie data for the Radarr movies whose recommendations were generated longest ago."""
+        movies = []
+        session = self.SessionLocal()
+        try:
+            query = session.query(RadarrMovie).order_by(RadarrMovie.recommendations_generated_at.asc().nulls_first(), RadarrMovie.id.asc()).limit(limit)
+            movies = [movie.as_dict() for movie in query.all()]
 
         except Exception as e:
-            logger.error(f"Error Adding Radarr Movie to DB: {str(e)}")
+            logger.error(f"Error Getting Stalest Radarr Movies: {str(e)}")
 
-    def store_movie(self, movie_data):
-        """Add a new movie to the database."""
+        finally:
+            session.close()
+            return movies
+
+    def sync_radarr_movies(self, radarr_movies):
+        """Diff the Radarr movie list against the database by TMDB ID and apply it in one transaction; an empty list is refused."""
+        timings = {}
         session = self.SessionLocal()
         try:
-            movie = RadarrMovie(**movie_data)
-            session.add(movie)
-            session.commit()
-            logger.info(f"Added movie: {movie_data['title']}")
+            started = time.perf_counter()
+            incoming_movies = {}
+            for movie in radarr_movies:
+                tmdb_id = movie.get("tmdbId")
+                if not tmdb_id:
+                    logger.warning(f"Skipping Radarr movie without TMDB ID: {movie.get('title')}")
+                    continue
+                incoming_movies[tmdb_id] = {
+                    "title": movie["title"].strip(),
+                    "title_key": name_key(movie["title"]),
+                    "genres": ", ".join(str(item) for item in movie.get("genres", [])),
+                    "tmdb_id": tmdb_id,
+                }
+
+            existing_rows = session.query(RadarrMovie.id, RadarrMovie.title, RadarrMovie.genres, RadarrMovie.tmdb_id).all()
+            existing_movies = {row.tmdb_id: row for row in existing_rows if row.tmdb_id}
+            if not incoming_movies and existing_rows:
+                raise ValueError(f"Radarr returned no movies, refusing to remove all {len(existing_rows)} stored movies")
+
+            movies_to_add = [movie for tmdb_id, movie in incoming_movies.items() if tmdb_id not in existing_movies]
+            movies_to_update = [
+                {"id": existing_movies[tmdb_id].id, "title": movie["title"], "title_key": movie["title_key"], "genres": movie["genres"]}
+                for tmdb_id, movie in incoming_movies.items()
+                if tmdb_id in existing_movies and (existing_movies[tmdb_id].title, existing_movies[tmdb_id].genres) != (movie["title"], movie["genres"])
+            ]
+            movie_ids_to_remove = [row.id for row in existing_rows if row.tmdb_id not in incoming_movies]
+            timings["diff"] = time.perf_counter() - started
+
+            return self._apply_library_diff(session, "Radarr", movies_to_add, movies_to_update, movie_ids_to_remove, timings)
 
         except Exception as e:
-            logger.error(f"Error Storing Movie: {str(e)}")
+            logger.error(f"Error Syncing Radarr Movies to DB: {str(e)}")
             session.rollback()
+            raise
 
         finally:
             session.close()
 
-    def store_recommended_movies_for_radarr_movie(self, radarr_movie_title, recommended_movies):
-        """Store recommended movies for a given Radarr movie."""
+    def store_recommended_movies_for_radarr_movie(self, radarr_movie_tmdb_id, recommended_movies):
+        """Store recommended movies for the Radarr movie with a TMDB ID, linking them to it and unlinking those no longer recommended; errors are re-raised after rollback."""
+        session = self.SessionLocal()
         try:
-            session = self.SessionLocal()
-
-            radarr_movie = session.query(RadarrMovie).filter(func.lower(RadarrMovie.title) == radarr_movie_title.lower()).first()
+            radarr_movie = session.query(RadarrMovie).filter(RadarrMovie.tmdb_id == radarr_movie_tmdb_id).first()
 
             if radarr_movie:
                 new_recommended_count = 0
-
-                movie_items_in_db = self.get_existing_db_movies()
-                movies_in_db = {movie["title"].lower() for movie in movie_items_in_db}
+                updated_recommended_count = 0
+                updated_keys = set()
+                incoming_ids = [recommended_item.get("tmdb_id") for recommended_item in recommended_movies]
+                movies_in_db = {tmdb_id for (tmdb_id,) in session.query(RadarrMovie.tmdb_id).filter(RadarrMovie.tmdb_id.in_(incoming_ids)).all()}
+                incoming_title_keys = [name_key(recommended_item["title"]) for recommended_item in recommended_movies]
+                dismissed_keys = {key for (key,) in session.query(DismissedMovie.title_key).filter(DismissedMovie.title_key.in_(incoming_title_keys)).all()}
+                catalog = {movie.tmdb_id: movie for movie in session.query(RecommendedMovie).filter(RecommendedMovie.tmdb_id.in_(incoming_ids)).all()}
+                existing_edges = {
+                    tmdb_id: edge
+                    for edge, tmdb_id in session.query(MovieRecommendation, RecommendedMovie.tmdb_id)
+                    .join(MovieRecommendation.recommended_movie)
+                    .filter(MovieRecommendation.radarr_movie_id == radarr_movie.id)
+                    .all()
+                }
 
                 for recommended_item in recommended_movies:
                     try:
                         recommended_title = recommended_item["title"].strip()
+                        tmdb_id = recommended_item.get("tmdb_id")
+                        movie_data = {key: value for key, value in recommended_item.items() if key != "similarity"}
 
-                        if recommended_title.lower() in movies_in_db:
+                        if tmdb_id in movies_in_db:
                             logger.info(f"Movie: {recommended_title} already in Radarr")
+                            continue
+
+                        if tmdb_id in catalog:
+                            recommended_movie = catalog[tmdb_id]
+                            for key, value in movie_data.items():
+                                if key != "status":
+                                    setattr(recommended_movie, key, value)
+                            recommended_movie.title_key = name_key(recommended_movie.title)
+                            updated_recommended_count += 1
+                            updated_keys.add(recommended_movie.title_key)
                         else:
-                            recommended_movie = RecommendedMovie(**recommended_item)
+                            recommended_movie = RecommendedMovie(**movie_data, dismissed=name_key(recommended_title) in dismissed_keys)
                             session.add(recommended_movie)
+                            catalog[tmdb_id] = recommended_movie
                             new_recommended_count += 1
                             logger.info(f"Added recommended movie: {recommended_title}")
 
-                            radarr_movie.recommended_movies.append(recommended_movie)
+                        if tmdb_id in existing_edges:
+                            existing_edges[tmdb_id].similarity_score = recommended_item.get("similarity")
+                        else:
+                            existing_edges[tmdb_id] = MovieRecommendation(radarr_movie=radarr_movie, recommended_movie=recommended_movie, similarity_score=recommended_item.get("similarity"))
+                            session.add(existing_edges[tmdb_id])
 
                     except Exception as e:
                         logger.error(f"Error Processing Recomendation: {recommended_title} {str(e)}")
 
+                stale_ids = [edge.recommended_movie_id for tmdb_id, edge in existing_edges.items() if tmdb_id not in incoming_ids] if recommended_movies else []
+                updated_keys |= self._unlink_stale_edges(session, radarr_movie.id, stale_ids)
+
+                radarr_movie.recommendations_generated_at = datetime.now()
                 session.commit()
-                logger.debug(f"Added {new_recommended_count} new recommended movies for {radarr_movie_title}.")
+                self._invalidate_stored_seed(radarr_movie.title_key, updated_keys)
+                logger.debug(f"Added {new_recommended_count} new, updated {updated_recommended_count} and unlinked {len(stale_ids)} recommended movies for {radarr_movie.title}.")
             else:
-                logger.error(f"RadarrMovie {radarr_movie_title} not found in the database.")
+                logger.error(f"RadarrMovie with TMDB ID {radarr_movie_tmdb_id} not found in the database.")
 
         except Exception as e:
-            logger.error(f"Error Getting Recommended Movies: {str(e)}")
+            logger.error(f"Error Storing Recommended Movies for TMDB ID {radarr_movie_tmdb_id}: {str(e)}")
+            session.rollback()
+            raise
 
         finally:
             session.close()
 
     def refresh_recommendations(self, data):
-        """Retrieve movie recommendations based on filters."""
+        """Retrieve one page of movie recommendations based on filters, with the cursor for the next page."""
         selected_movie = data.get("selected_movie", "all").lower()
         min_popularity = data.get("min_popularity", None)
         min_vote_average = data.get("min_vote_average", None)
         sort_by = data.get("sort_by", "random")
-        num_results = data.get("num_results", 10)
-        page = data.get("page", 1)
-
-        if selected_movie == "all":
-            db_results = self._get_random_movies(min_popularity, min_vote_average, sort_by, num_results, page)
+        num_results = max(int(data.get("num_results") or 10), 1)
+        cursor = data.get("cursor")
+
+        shuffled = selected_movie == "all" and sort_by not in self.sort_columns
+        if shuffled:
+            self._note_shuffle_request(cursor)
+
+        cache_key = ResultCache.make_key(
+            {
+                "selected_movie": selected_movie,
+                "min_popularity": min_popularity,
+                "min_vote_average": min_vote_average,
+                "sort_by": sort_by,
+                "num_results": num_results,
+                "cursor": cursor,
+                "seed": data.get("seed") if shuffled else None,
+            }
+        )
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            json_results, next_cursor = cached
+            logger.debug(f"Served recommended movies page from cache ({self.result_cache.stats()})")
         else:
-            db_results = self._get_recommended_movies_for_radarr_movie(selected_movie, min_popularity, min_vote_average, sort_by)
-
-        json_results = [movie.as_dict() for movie in db_results]
-        self.recommended_movies = json_results
-        return json_results
-
-    def _get_recommended_movies_for_radarr_movie(self, radarr_movie_title, min_popularity=None, min_vote_average=None, sort_by="popularity"):
-        """Retrieve all recommended movies for a given Radarr movie, with optional filtering."""
-        session = self.SessionLocal()
-        try:
-            logger.debug(f"Getting recommended movies for: {radarr_movie_title}")
-            radarr_movie = session.query(RadarrMovie).filter(func.lower(RadarrMovie.title) == radarr_movie_title.lower()).first()
-
-            if radarr_movie:
-                recommended_movies_query = session.query(RecommendedMovie).filter(RecommendedMovie.radarr_movie_id == radarr_movie.id, ~RecommendedMovie.title.in_(session.query(DismissedMovie.title)))
-
-                if min_popularity:
-                    recommended_movies_query = recommended_movies_query.filter(RecommendedMovie.popularity >= min_popularity)
-                if min_vote_average:
-                    recommended_movies_query = recommended_movies_query.filter(RecommendedMovie.vote_average >= min_vote_average)
-
-                recommended_movies_query = self._apply_sorting(recommended_movies_query, sort_by)
-                recommended_movies = recommended_movies_query.all()
-
-                logger.debug(f"Found {len(recommended_movies)} stored recommendations for: {radarr_movie_title}")
-                return recommended_movies
-
+            if shuffled:
+                db_results, next_cursor = self._get_shuffled_page(self._filters(min_popularity, min_vote_average), num_results, data.get("seed"), cursor)
             else:
-                logger.error(f"RadarrMovie {radarr_movie_title} not found.")
-                return []
-
-        except Exception as e:
-            logger.error(f"Error getting recommendations for {radarr_movie_title}: {str(e)}")
-            return []
+                db_results, next_cursor = self._get_sorted_movies(selected_movie, min_popularity, min_vote_average, sort_by, num_results, cursor)
 
-        finally:
-            session.close()
+            json_results = [dict(zip(self.card_fields, row)) for row in db_results]
+            tags = {movie.title_key for movie in db_results}
+            if selected_movie != "all":
+                tags.add(self._seed_tag(name_key(selected_movie)))
+            self.result_cache.put(cache_key, (json_results, next_cursor), tags=tags)
 
-    def _get_random_movies(self, min_popularity=None, min_vote_average=None, sort_by="popularity", num_results=10, page=1):
-        """Retrieve random movies with filters, sorting, and pagination."""
+        self.recommended_movies = json_results
+        self.recommended_movies_cursor = next_cursor
+        self.recommended_movies_request = {
+            "selected_movie": data.get("selected_movie"),
+            "sort_by": sort_by,
+            "min_popularity": min_popularity,
+            "min_vote_average": min_vote_average,
+            "seed": data.get("seed"),
+        }
+        return json_results, next_cursor
+
+    def _filters(self, min_popularity=None, min_vote_average=None):
+        filters = []
+        if min_popularity:
+            filters.append(RecommendedMovie.popularity >= min_popularity)
+        if min_vote_average:
+            filters.append(RecommendedMovie.vote_average >= min_vote_average)
+        return filters
+
+    def _get_sorted_movies(self, selected_movie, min_popularity=None, min_vote_average=None, sort_by="pop-desc", num_results=10, cursor=None):
+        """Retrieve one keyset page of recommended movies, for every Radarr movie or just the selected one."""
         session = self.SessionLocal()
         try:
-            query = session.query(RecommendedMovie).filter(~RecommendedMovie.title.in_(session.query(DismissedMovie.title)))
-
-            if min_popularity:
-                query = query.filter(RecommendedMovie.popularity >= min_popularity)
-            if min_vote_average:
-                query = query.filter(RecommendedMovie.vote_average >= min_vote_average)
-
-            query = self._apply_sorting(query, sort_by)
-
-            query = query.group_by(RecommendedMovie.title)
+            query = self._card_query(session)
 
-            offset = (page - 1) * num_results
-            query = query.offset(offset).limit(num_results)
+            if selected_movie != "all":
+                radarr_movie = session.query(RadarrMovie.id).filter(RadarrMovie.title_key == name_key(selected_movie)).first()
+                if not radarr_movie:
+                    logger.error(f"RadarrMovie {selected_movie} not found.")
+                    return [], None
+                query = query.join(MovieRecommendation, MovieRecommendation.recommended_movie_id == RecommendedMovie.id).filter(MovieRecommendation.radarr_movie_id == radarr_movie.id)
 
-            movies = query.all()
+            query = query.filter(*self._filters(min_popularity, min_vote_average))
+            sort_column, descending = self.sort_columns.get(sort_by, (RecommendedMovie.shuffle_key, False))
+            movies, next_cursor = keyset_page(query, sort_column, RecommendedMovie.id, descending, num_results, cursor)
 
-            logger.debug(f"Page {page}: Retrieved {len(movies)} movies sorted by {sort_by}")
-            return movies
+            logger.debug(f"Retrieved {len(movies)} movies for {selected_movie} sorted by {sort_by}")
+            return movies, next_cursor
 
         except Exception as e:
-            logger.error(f"Error retrieving random movies: {str(e)}")
-            return []
+            logger.error(f"Error retrieving recommended movies for {selected_movie}: {str(e)}")
+            return [], None
 
         finally:
             session.close()
 
-    def _apply_sorting(self, query, sort_by):
-        """Apply sorting based on the selected criteria."""
-        if sort_by == "random":
-            return query.order_by(func.random())
-        elif sort_by == "pop-desc":
-            return query.order_by(RecommendedMovie.popularity.desc())
-        elif sort_by == "pop-asc":
-            return query.order_by(RecommendedMovie.popularity.asc())
-        elif sort_by == "average-vote-desc":
-            return query.order_by(RecommendedMovie.vote_average.desc())
-        elif sort_by == "average-vote-asc":
-            return query.order_by(RecommendedMovie.vote_average.asc())
-        else:
-            return query
-
     def update_status_for_recommended_movie(self, movie_title, status):
         """Update the status of all recommended movies for a given movie title."""
         try:
             session = self.SessionLocal()
 
-            recommended_movies = session.query(RecommendedMovie).filter(func.lower(RecommendedMovie.title) == movie_title.lower()).all()
+            recommended_movies = session.query(RecommendedMovie).filter(RecommendedMovie.title_key == name_key(movie_title)).all()
 
             if recommended_movies:
                 for recommended_movie in recommended_movies:
                     recommended_movie.status = status
 
                 session.commit()
+                self.result_cache.invalidate_tag(name_key(movie_title))
                 logger.info(f"Updated status for {len(recommended_movies)} recommended movies with title '{movie_title}' to '{status}'.")
 
             for rec in self.recommended_movies:
-                if rec.get("title", "").lower() == movie_title.lower():
+                if name_key(rec.get("title", "")) == name_key(movie_title):
                     rec["status"] = status
 
             else:
@@ -230,21 +327,24 @@ class MovieDBHandler(DatabaseHandler):
             session.close()
 
     def dismiss_movie(self, raw_movie_title):
-        """Mark an movie as dismissed by adding to the dismissed table."""
+        """Mark an movie as dismissed by adding to the dismissed table and flagging its recommendation."""
         session = self.get_session()
         try:
             movie_title = urllib.parse.unquote(raw_movie_title)
-            existing_dismissed = session.query(DismissedMovie).filter(func.lower(DismissedMovie.title) == movie_title.lower()).first()
+            existing_dismissed = session.query(DismissedMovie).filter(DismissedMovie.title_key == name_key(movie_title)).first()
 
             if not existing_dismissed:
                 dismissed_movie = DismissedMovie(title=movie_title)
                 session.add(dismissed_movie)
-                session.commit()
                 logger.info(f"Dismissed movie: {movie_title}")
             else:
                 logger.info(f"Movie '{movie_title}' is already dismissed.")
 
-            self.recommended_movies = [movie for movie in self.recommended_movies if movie.get("title", "").lower() != movie_title.lower()]
+            session.query(RecommendedMovie).filter(RecommendedMovie.title_key == name_key(movie_title)).update({"dismissed": True}, synchronize_session=False)
+            session.commit()
+
+            self.result_cache.invalidate_tag(name_key(movie_title))
+            self.recommended_movies = [movie for movie in self.recommended_movies if name_key(movie.get("title", "")) != name_key(movie_title)]
 
         except Exception as e:
             logger.error(f"Error dismissing movie: {str(e)}")
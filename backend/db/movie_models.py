@@ -1,6 +1,7 @@
-from db.base import Base
-from sqlalchemy import Column, Float, ForeignKey, Integer, String
+from db.base import Base, name_key_default
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, UniqueConstraint
 from sqlalchemy.orm import relationship
+from utils.pagination import random_shuffle_key
 
 
 class DismissedMovie(Base):
@@ -8,13 +9,22 @@ class DismissedMovie(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, unique=True, index=True)
+    title_key = Column(String, index=True, default=name_key_default("title"))
 
 
 class RecommendedMovie(Base):
     __tablename__ = "recommended_movies"
+    __table_args__ = (
+        Index("ix_recommended_movies_visible_shuffle_key", "dismissed", "in_library", "shuffle_key"),
+        Index("ix_recommended_movies_visible_popularity_id", "dismissed", "in_library", "popularity", "id"),
+        Index("ix_recommended_movies_visible_vote_average_id", "dismissed", "in_library", "vote_average", "id"),
+        Index("ix_recommended_movies_visible_score_id", "dismissed", "in_library", "score", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
+    title_key = Column(String, index=True, default=name_key_default("title"))
+    shuffle_key = Column(Integer, default=random_shuffle_key)
     genres = Column(String)
     original_language = Column(String)
     popularity = Column(Float)
@@ -22,14 +32,15 @@ class RecommendedMovie(Base):
     vote_count = Column(Integer)
     first_air_date = Column(String)
     year = Column(String)
-    tmdb_id = Column(Integer)
+    tmdb_id = Column(Integer, unique=True, index=True)
     image = Column(String)
     overview = Column(String)
     status = Column(String, default="")
+    score = Column(Float, default=0.0)
+    dismissed = Column(Boolean, default=False)
+    in_library = Column(Boolean, default=False)
 
-    radarr_movie_id = Column(Integer, ForeignKey("radarr_movies.id"))
-
-    radarr_movie = relationship("RadarrMovie", back_populates="recommended_movies")
+    recommendations = relationship("MovieRecommendation", back_populates="recommended_movie")
 
     def as_dict(self):
         return {
@@ -49,15 +60,30 @@ class RecommendedMovie(Base):
         }
 
 
+class MovieRecommendation(Base):
+    __tablename__ = "movie_recommendations"
+    __table_args__ = (UniqueConstraint("radarr_movie_id", "recommended_movie_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    radarr_movie_id = Column(Integer, ForeignKey("radarr_movies.id"), index=True)
+    recommended_movie_id = Column(Integer, ForeignKey("recommended_movies.id"), index=True)
+    similarity_score = Column(Float, nullable=True)
+
+    radarr_movie = relationship("RadarrMovie", back_populates="recommendations")
+    recommended_movie = relationship("RecommendedMovie", back_populates="recommendations")
+
+
 class RadarrMovie(Base):
     __tablename__ = "radarr_movies"
 
     id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, unique=True, index=True)
+    title = Column(String, index=True)
+    title_key = Column(String, index=True, default=name_key_default("title"))
     genres = Column(String)
-    tmdb_id = Column(Integer)
+    tmdb_id = Column(Integer, unique=True, index=True)
+    recommendations_generated_at = Column(DateTime, nullable=True, index=True)
 
-    recommended_movies = relationship("RecommendedMovie", back_populates="radarr_movie")
+    recommendations = relationship("MovieRecommendation", back_populates="radarr_movie")
 
     def as_dict(self):
         return {
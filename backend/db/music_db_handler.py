@@ -1,15 +1,49 @@
+import time
 import urllib.parse
+from datetime import datetime
 
-from db.database_handler import DatabaseHandler
-from db.music_models import DismissedArtist, LidarrArtist, RecommendedArtist
+from db.catalog_db_handler import CatalogDBHandler
+from db.music_models import ArtistRecommendation, DismissedArtist, LidarrArtist, RecommendedArtist
 from logger import logger
-from sqlalchemy import func
+from sqlalchemy import exists
+from utils.pagination import keyset_page
+from utils.result_cache import ResultCache
+from utils.string_cleaner import name_key
 
 
-class MusicDBHandler(DatabaseHandler):
+class MusicDBHandler(CatalogDBHandler):
     def __init__(self):
         super().__init__()
         self.recommended_artists = []
+        self.recommended_artists_cursor = None
+        self.recommended_artists_request = {}
+        self.label = "artists"
+        self.catalog_model = RecommendedArtist
+        self.tag_column = RecommendedArtist.name_key
+        self.library_model = LidarrArtist
+        self.library_match = (RecommendedArtist.name_key, LidarrArtist.name_key)
+        self.edge_model = ArtistRecommendation
+        self.edge_seed_column = ArtistRecommendation.lidarr_artist_id
+        self.edge_catalog_column = ArtistRecommendation.recommended_artist_id
+        self.popularity_column = RecommendedArtist.listeners
+        self.sort_columns = {
+            "plays-desc": (RecommendedArtist.play_count, True),
+            "plays-asc": (RecommendedArtist.play_count, False),
+            "listeners-desc": (RecommendedArtist.listeners, True),
+            "listeners-asc": (RecommendedArtist.listeners, False),
+            "score": (RecommendedArtist.score, True),
+        }
+        self.card_columns = [
+            RecommendedArtist.id,
+            RecommendedArtist.name,
+            RecommendedArtist.genre,
+            RecommendedArtist.listeners,
+            RecommendedArtist.play_count,
+            RecommendedArtist.image,
+            RecommendedArtist.overview,
+            RecommendedArtist.status,
+        ]
+        self.card_fields = [column.key for column in self.card_columns]
 
     def get_existing_db_artists(self):
         """Retrieve all artist names from the database (lowercase for case-insensitive matching)."""
@@ -25,188 +59,248 @@ class MusicDBHandler(DatabaseHandler):
         finally:
             return artists
 
-    def add_lidarr_artists(self, lidarr_artists):
+    def get_lidarr_artists_without_recommendations(self):
+        """Retrieve the names of Lidarr artists that have never had recommendations generated."""
+        artist_names = []
+        session = self.SessionLocal()
         try:
-            """Add new artists from Lidarr if they are not already in the database."""
-            artists_in_db = self.get_existing_db_artists()
-            new_artists_count = 0
+            has_recommendations = exists().where(ArtistRecommendation.lidarr_artist_id == LidarrArtist.id)
+            artist_names = [artist.name for artist in session.query(LidarrArtist.name).filter(~has_recommendations, LidarrArtist.recommendations_generated_at.is_(None)).all()]
 
-            for artist in lidarr_artists:
-                artist_name = artist["artistName"].strip().lower()
-                if artist_name not in artists_in_db:
-                    artist_data = {
-                        "name": artist["artistName"].strip(),
-                        "genres": ", ".join(str(item) for item in artist.get("genres", [])),
-                        "mbid": artist.get("foreignArtistId", ""),
-                    }
-                    self.store_artist(artist_data)
-                    new_artists_count += 1
-                else:
-                    logger.debug(f"Skipping existing artist: {artist['artistName']}")
-
-            logger.debug(f"Added {new_artists_count} new artists.")
+        except Exception as e:
+            logger.error(f"Error Getting Lidarr Artists Without Recommendations: {str(e)}")
+
+        finally:
+            session.close()
+            return artist_names
+
+    def get_stalest_lidarr_artists(self, limit):
+        """Retrieve the names of the Lidarr artists whose recommendations were generated longest ago."""
+        artist_names = []
+        session = self.SessionLocal()
+        try:
+            query = session.query(LidarrArtist.name).order_by(LidarrArtist.recommendations_generated_at.asc().nulls_first(), LidarrArtist.id.asc()).limit(limit)
+            artist_names = [artist.name for artist in query.all()]
 
         except Exception as e:
-            logger.error(f"Error Adding Lidarr Artist to DB: {str(e)}")
+            logger.error(f"Error Getting Stalest Lidarr Artists: {str(e)}")
+
+        finally:
+            session.close()
+            return artist_names
 
-    def store_artist(self, artist_data):
-        """Add a new artist to the database."""
+    def sync_lidarr_artists(self, lidarr_artists):
+        """Diff the Lidarr artist list against the database by MusicBrainz ID, or name key without one, and apply it in one transaction; an empty list is refused."""
+        timings = {}
         session = self.SessionLocal()
         try:
-            artist = LidarrArtist(**artist_data)
-            session.add(artist)
-            session.commit()
-            logger.info(f"Added artist: {artist_data['name']}")
+            started = time.perf_counter()
+            incoming_artists = {}
+            for artist in lidarr_artists:
+                artist_name = artist["artistName"].strip()
+                artist_mbid = artist.get("foreignArtistId") or ""
+                incoming_artists[artist_mbid or f"name:{name_key(artist_name)}"] = {
+                    "name": artist_name,
+                    "name_key": name_key(artist_name),
+                    "genres": ", ".join(str(item) for item in artist.get("genres", [])),
+                    "mbid": artist_mbid,
+                }
+
+            existing_artists = session.query(LidarrArtist.id, LidarrArtist.name, LidarrArtist.name_key, LidarrArtist.genres, LidarrArtist.mbid).all()
+            if not incoming_artists and existing_artists:
+                raise ValueError(f"Lidarr returned no artists, refusing to remove all {len(existing_artists)} stored artists")
+
+            existing_by_mbid = {row.mbid: row for row in existing_artists if row.mbid}
+            existing_by_name_key = {row.name_key: row for row in existing_artists}
+            matched_ids = set()
+            artists_to_add = []
+            artists_to_update = []
+            for artist in incoming_artists.values():
+                row = existing_by_mbid.get(artist["mbid"]) if artist["mbid"] else None
+                if row is None:
+                    row = existing_by_name_key.get(artist["name_key"])
+                    if row is not None and row.mbid and artist["mbid"]:
+                        row = None
+                if row is None or row.id in matched_ids:
+                    artists_to_add.append(artist)
+                    continue
+
+                matched_ids.add(row.id)
+                if (row.name, row.genres, row.mbid) != (artist["name"], artist["genres"], artist["mbid"]):
+                    artists_to_update.append({"id": row.id, **artist})
+            artist_ids_to_remove = [row.id for row in existing_artists if row.id not in matched_ids]
+            timings["diff"] = time.perf_counter() - started
+
+            return self._apply_library_diff(session, "Lidarr", artists_to_add, artists_to_update, artist_ids_to_remove, timings)
 
         except Exception as e:
-            logger.error(f"Error Storing Artist: {str(e)}")
+            logger.error(f"Error Syncing Lidarr Artists to DB: {str(e)}")
             session.rollback()
+            raise
 
         finally:
             session.close()
 
     def store_recommended_artists_for_lidarr_artist(self, lidarr_artist_name, recommended_artists):
-        """Store recommended artists for a given Lidarr artist."""
+        """Store recommended artists for a Lidarr artist, linking them to it and unlinking those no longer recommended; errors are re-raised after rollback."""
+        session = self.SessionLocal()
         try:
-            session = self.SessionLocal()
-
-            lidarr_artist = session.query(LidarrArtist).filter(func.lower(LidarrArtist.name) == lidarr_artist_name.lower()).first()
+            lidarr_artist = session.query(LidarrArtist).filter(LidarrArtist.name_key == name_key(lidarr_artist_name)).first()
 
             if lidarr_artist:
                 new_recommended_count = 0
-                artists_in_db = self.get_existing_db_artists()
+                updated_recommended_count = 0
+                updated_keys = set()
+                incoming_keys = [name_key(recommended["name"]) for recommended in recommended_artists]
+                artists_in_db = {key for (key,) in session.query(LidarrArtist.name_key).filter(LidarrArtist.name_key.in_(incoming_keys)).all()}
+                dismissed_keys = {key for (key,) in session.query(DismissedArtist.name_key).filter(DismissedArtist.name_key.in_(incoming_keys)).all()}
+                catalog = {artist.name_key: artist for artist in session.query(RecommendedArtist).filter(RecommendedArtist.name_key.in_(incoming_keys)).all()}
+                existing_edges = {
+                    key: edge
+                    for edge, key in session.query(ArtistRecommendation, RecommendedArtist.name_key)
+                    .join(ArtistRecommendation.recommended_artist)
+                    .filter(ArtistRecommendation.lidarr_artist_id == lidarr_artist.id)
+                    .all()
+                }
                 for recommended in recommended_artists:
                     try:
                         recommended_name = recommended["name"].strip()
-                        if recommended_name.lower() in artists_in_db:
+                        recommended_key = name_key(recommended_name)
+                        if recommended_key in artists_in_db:
                             logger.info(f"Artist: {recommended_name} already in Lidarr")
+                            continue
+
+                        if recommended_key in catalog:
+                            recommended_artist = catalog[recommended_key]
+                            for key in ["genre", "listeners", "play_count", "image", "overview"]:
+                                setattr(recommended_artist, key, recommended[key])
+                            updated_recommended_count += 1
+                            updated_keys.add(recommended_key)
                         else:
-                            recommended_artist_data = {
-                                "name": recommended["name"],
-                                "genre": recommended["genre"],
-                                "listeners": recommended["listeners"],
-                                "play_count": recommended["play_count"],
-                                "image": recommended["image"],
-                                "overview": recommended["overview"],
-                                "lidarr_artist_id": lidarr_artist.id,
-                                "status": "",
-                            }
-
-                            recommended_artist = RecommendedArtist(**recommended_artist_data)
+                            recommended_artist = RecommendedArtist(
+                                name=recommended_name,
+                                genre=recommended["genre"],
+                                listeners=recommended["listeners"],
+                                play_count=recommended["play_count"],
+                                image=recommended["image"],
+                                overview=recommended["overview"],
+                                status="",
+                                dismissed=recommended_key in dismissed_keys,
+                            )
                             session.add(recommended_artist)
+                            catalog[recommended_key] = recommended_artist
                             new_recommended_count += 1
                             logger.info(f"Added recommended artist: {recommended_name}")
 
-                            lidarr_artist.recommended_artists.append(recommended_artist)
+                        if recommended_key in existing_edges:
+                            existing_edges[recommended_key].similarity_score = recommended.get("similarity")
+                        else:
+                            existing_edges[recommended_key] = ArtistRecommendation(lidarr_artist=lidarr_artist, recommended_artist=recommended_artist, similarity_score=recommended.get("similarity"))
+                            session.add(existing_edges[recommended_key])
 
                     except Exception as e:
                         logger.error(f"Error Processing Recomendation: {recommended_name} {str(e)}")
 
+                stale_ids = [edge.recommended_artist_id for key, edge in existing_edges.items() if key not in incoming_keys] if recommended_artists else []
+                updated_keys |= self._unlink_stale_edges(session, lidarr_artist.id, stale_ids)
+
+                lidarr_artist.recommendations_generated_at = datetime.now()
                 session.commit()
-                logger.debug(f"Added {new_recommended_count} new recommended artists for {lidarr_artist_name}.")
+                self._invalidate_stored_seed(lidarr_artist.name_key, updated_keys)
+                logger.debug(f"Added {new_recommended_count} new, updated {updated_recommended_count} and unlinked {len(stale_ids)} recommended artists for {lidarr_artist_name}.")
             else:
                 logger.error(f"LidarrArtist {lidarr_artist_name} not found in the database.")
 
         except Exception as e:
-            logger.error(f"Error Getting Recommended Artists: {str(e)}")
+            logger.error(f"Error Storing Recommended Artists for {lidarr_artist_name}: {str(e)}")
+            session.rollback()
+            raise
 
         finally:
             session.close()
 
     def refresh_recommendations(self, data):
-        """Main entry function to get recommendations."""
+        """Main entry function to get recommendations, returning one page and the cursor for the next."""
         selected_artist = data.get("selected_artist", "").lower()
         min_play_count = data.get("min_play_count", None)
         min_listeners = data.get("min_listeners", None)
         sort_by = data.get("sort_by", "play_count")
-        num_results = data.get("num_results", 10)
-        page = data.get("page", 1)
-
-        if selected_artist == "all":
-            db_results = self._get_random_artists(min_play_count, min_listeners, sort_by, num_results, page)
+        num_results = max(int(data.get("num_results") or 10), 1)
+        cursor = data.get("cursor")
+
+        shuffled = selected_artist == "all" and sort_by not in self.sort_columns
+        if shuffled:
+            self._note_shuffle_request(cursor)
+
+        cache_key = ResultCache.make_key(
+            {
+                "selected_artist": selected_artist,
+                "min_play_count": min_play_count,
+                "min_listeners": min_listeners,
+                "sort_by": sort_by,
+                "num_results": num_results,
+                "cursor": cursor,
+                "seed": data.get("seed") if shuffled else None,
+            }
+        )
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            json_results, next_cursor = cached
+            logger.debug(f"Served recommended artists page from cache ({self.result_cache.stats()})")
         else:
-            db_results = self._get_recommended_artists_for_lidarr_artist(selected_artist, min_play_count, min_listeners, sort_by)
-
-        json_results = [artist.as_dict() for artist in db_results]
-        self.recommended_artists = json_results
-        return json_results
-
-    def _get_recommended_artists_for_lidarr_artist(self, lidarr_artist_name, min_play_count=None, min_listeners=None, sort_by="play_count"):
-        """Retrieve all recommended artists for a given Lidarr artist, with optional filtering."""
-        session = self.SessionLocal()
-        try:
-            logger.debug(f"Getting recommended artists for: {lidarr_artist_name}")
-            lidarr_artist = session.query(LidarrArtist).filter(func.lower(LidarrArtist.name) == lidarr_artist_name.lower()).first()
-
-            if lidarr_artist:
-                recommended_artists_query = session.query(RecommendedArtist).filter(
-                    RecommendedArtist.lidarr_artist_id == lidarr_artist.id, ~RecommendedArtist.name.in_(session.query(DismissedArtist.name))
-                )
-
-                if min_play_count:
-                    recommended_artists_query = recommended_artists_query.filter(RecommendedArtist.play_count >= min_play_count)
-                if min_listeners:
-                    recommended_artists_query = recommended_artists_query.filter(RecommendedArtist.listeners >= min_listeners)
-
-                if sort_by == "plays-desc":
-                    recommended_artists_query = recommended_artists_query.order_by(RecommendedArtist.play_count.desc())
-                elif sort_by == "plays-asc":
-                    recommended_artists_query = recommended_artists_query.order_by(RecommendedArtist.play_count.asc())
-                elif sort_by == "listeners-desc":
-                    recommended_artists_query = recommended_artists_query.order_by(RecommendedArtist.listeners.desc())
-                elif sort_by == "listeners-asc":
-                    recommended_artists_query = recommended_artists_query.order_by(RecommendedArtist.listeners.asc())
-
-                recommended_artists = recommended_artists_query.all()
-
-                logger.debug(f"Found {len(recommended_artists)} recommended artists for: {lidarr_artist_name}")
-                return recommended_artists
+            if shuffled:
+                db_results, next_cursor = self._get_shuffled_page(self._filters(min_play_count, min_listeners), num_results, data.get("seed"), cursor)
             else:
-                logger.error(f"LidarrArtist {lidarr_artist_name} not found.")
-                return []
-
-        except Exception as e:
-            logger.error(f"Error retrieving recommended artists for: {lidarr_artist_name} -> {str(e)}")
-            return []
+                db_results, next_cursor = self._get_sorted_artists(selected_artist, min_play_count, min_listeners, sort_by, num_results, cursor)
 
-        finally:
-            session.close()
+            json_results = [dict(zip(self.card_fields, row)) for row in db_results]
+            tags = {artist.name_key for artist in db_results}
+            if selected_artist != "all":
+                tags.add(self._seed_tag(name_key(selected_artist)))
+            self.result_cache.put(cache_key, (json_results, next_cursor), tags=tags)
 
-    def _get_random_artists(self, min_play_count=None, min_listeners=None, sort_by="play_count", num_results=10, page=1):
-        """Retrieve random recommended artists with filters, sorting, and pagination."""
+        self.recommended_artists = json_results
+        self.recommended_artists_cursor = next_cursor
+        self.recommended_artists_request = {
+            "selected_artist": data.get("selected_artist"),
+            "sort_by": sort_by,
+            "min_play_count": min_play_count,
+            "min_listeners": min_listeners,
+            "seed": data.get("seed"),
+        }
+        return json_results, next_cursor
+
+    def _filters(self, min_play_count=None, min_listeners=None):
+        filters = []
+        if min_play_count:
+            filters.append(RecommendedArtist.play_count >= min_play_count)
+        if min_listeners:
+            filters.append(RecommendedArtist.listeners >= min_listeners)
+        return filters
+
+    def _get_sorted_artists(self, selected_artist, min_play_count=None, min_listeners=None, sort_by="plays-desc", num_results=10, cursor=None):
+        """Retrieve one keyset page of recommended artists, for every Lidarr artist or just the selected one."""
         session = self.SessionLocal()
         try:
-            query = session.query(RecommendedArtist).filter(~RecommendedArtist.name.in_(session.query(DismissedArtist.name)))
-
-            if min_play_count:
-                query = query.filter(RecommendedArtist.play_count >= min_play_count)
-            if min_listeners:
-                query = query.filter(RecommendedArtist.listeners >= min_listeners)
-
-            if sort_by == "random":
-                query = query.order_by(func.random())
-            elif sort_by == "plays-desc":
-                query = query.order_by(RecommendedArtist.play_count.desc())
-            elif sort_by == "plays-asc":
-                query = query.order_by(RecommendedArtist.play_count.asc())
-            elif sort_by == "listeners-desc":
-                query = query.order_by(RecommendedArtist.listeners.desc())
-            elif sort_by == "listeners-asc":
-                query = query.order_by(RecommendedArtist.listeners.asc())
+            query = self._card_query(session)
 
-            query = query.group_by(RecommendedArtist.name)
+            if selected_artist != "all":
+                lidarr_artist = session.query(LidarrArtist.id).filter(LidarrArtist.name_key == name_key(selected_artist)).first()
+                if not lidarr_artist:
+                    logger.error(f"LidarrArtist {selected_artist} not found.")
+                    return [], None
+                query = query.join(ArtistRecommendation, ArtistRecommendation.recommended_artist_id == RecommendedArtist.id).filter(ArtistRecommendation.lidarr_artist_id == lidarr_artist.id)
 
-            offset = (page - 1) * num_results
-            query = query.offset(offset).limit(num_results)
+            query = query.filter(*self._filters(min_play_count, min_listeners))
+            sort_column, descending = self.sort_columns.get(sort_by, (RecommendedArtist.shuffle_key, False))
+            artists, next_cursor = keyset_page(query, sort_column, RecommendedArtist.name_key, descending, num_results, cursor)
 
-            artists = query.all()
-
-            logger.debug(f"Page {page}: Retrieved {len(artists)} artists sorted by {sort_by}")
-            return artists
+            logger.debug(f"Retrieved {len(artists)} artists for {selected_artist} sorted by {sort_by}")
+            return artists, next_cursor
 
         except Exception as e:
-            logger.error(f"Error retrieving random artists: {str(e)}")
-            return []
+            logger.error(f"Error retrieving recommended artists for {selected_artist}: {str(e)}")
+            return [], None
 
         finally:
             session.close()
@@ -216,17 +310,18 @@ class MusicDBHandler(DatabaseHandler):
         try:
             session = self.SessionLocal()
 
-            recommended_artists = session.query(RecommendedArtist).filter(func.lower(RecommendedArtist.name) == artist_name.lower()).all()
+            recommended_artists = session.query(RecommendedArtist).filter(RecommendedArtist.name_key == name_key(artist_name)).all()
 
             if recommended_artists:
                 for recommended_artist in recommended_artists:
                     recommended_artist.status = status
 
                 session.commit()
+                self.result_cache.invalidate_tag(name_key(artist_name))
                 logger.info(f"Updated status for {len(recommended_artists)} recommended artists with name '{artist_name}' to '{status}'.")
 
             for rec in self.recommended_artists:
-                if rec.get("name", "").lower() == artist_name.lower():
+                if name_key(rec.get("name", "")) == name_key(artist_name):
                     rec["status"] = status
 
             else:
@@ -239,21 +334,24 @@ class MusicDBHandler(DatabaseHandler):
             session.close()
 
     def dismiss_artist(self, raw_artist_name):
-        """Mark an artist as dismissed by adding to the dismissed table."""
+        """Mark an artist as dismissed by adding to the dismissed table and flagging its recommendation."""
         session = self.get_session()
         try:
             artist_name = urllib.parse.unquote(raw_artist_name)
-            existing_dismissed = session.query(DismissedArtist).filter(func.lower(DismissedArtist.name) == artist_name.lower()).first()
+            existing_dismissed = session.query(DismissedArtist).filter(DismissedArtist.name_key == name_key(artist_name)).first()
 
             if not existing_dismissed:
                 dismissed_artist = DismissedArtist(name=artist_name)
                 session.add(dismissed_artist)
-                session.commit()
                 logger.info(f"Dismissed artist: {artist_name}")
             else:
                 logger.info(f"Artist '{artist_name}' is already dismissed.")
 
-            self.recommended_artists = [artist for artist in self.recommended_artists if artist.get("name", "").lower() != artist_name.lower()]
+            session.query(RecommendedArtist).filter(RecommendedArtist.name_key == name_key(artist_name)).update({"dismissed": True}, synchronize_session=False)
+            session.commit()
+
+            self.result_cache.invalidate_tag(name_key(artist_name))
+            self.recommended_artists = [artist for artist in self.recommended_artists if name_key(artist.get("name", "")) != name_key(artist_name)]
 
         except Exception as e:
             logger.error(f"Error dismissing artist: {str(e)}")
@@ -1,6 +1,7 @@
-from db.base import Base
-from sqlalchemy import Column, ForeignKey, Integer, String
+from db.base import Base, name_key_default
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, String, UniqueConstraint
 from sqlalchemy.orm import relationship
+from utils.pagination import random_shuffle_key
 
 
 class DismissedArtist(Base):
@@ -8,43 +9,58 @@ class DismissedArtist(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
+    name_key = Column(String, index=True, default=name_key_default("name"))
 
 
 class RecommendedArtist(Base):
     __tablename__ = "recommended_artists"
+    __table_args__ = (
+        Index("ix_recommended_artists_visible_shuffle_key", "dismissed", "in_library", "shuffle_key"),
+        Index("ix_recommended_artists_visible_play_count_name_key", "dismissed", "in_library", "play_count", "name_key"),
+        Index("ix_recommended_artists_visible_listeners_name_key", "dismissed", "in_library", "listeners", "name_key"),
+        Index("ix_recommended_artists_visible_score_name_key", "dismissed", "in_library", "score", "name_key"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
+    name_key = Column(String, unique=True, index=True, default=name_key_default("name"))
+    shuffle_key = Column(Integer, default=random_shuffle_key)
     genre = Column(String)
     listeners = Column(Integer)
     play_count = Column(Integer)
     image = Column(String)
     overview = Column(String)
     status = Column(String, default="")
+    score = Column(Float, default=0.0)
+    dismissed = Column(Boolean, default=False)
+    in_library = Column(Boolean, default=False)
 
-    lidarr_artist_id = Column(Integer, ForeignKey("lidarr_artists.id"))
-
-    lidarr_artist = relationship("LidarrArtist", back_populates="recommended_artists")
+    recommendations = relationship("ArtistRecommendation", back_populates="recommended_artist")
 
     def as_dict(self):
         return {
             "id": self.id,
             "name": self.name,
             "genre": self.genre,
-            "listeners": f"Listeners: {self._format_numbers(self.listeners)}",
-            "play_count": f"Play Count: {self._format_numbers(self.play_count)}",
+            "listeners": self.listeners,
+            "play_count": self.play_count,
             "image": self.image,
             "overview": self.overview,
             "status": self.status,
         }
 
-    @staticmethod
-    def _format_numbers(count):
-        if count >= 1_000_000:
-            return f"{count / 1_000_000:.1f}M"
-        elif count >= 1_000:
-            return f"{count / 1_000:.1f}K"
-        return str(count)
+
+class ArtistRecommendation(Base):
+    __tablename__ = "artist_recommendations"
+    __table_args__ = (UniqueConstraint("lidarr_artist_id", "recommended_artist_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    lidarr_artist_id = Column(Integer, ForeignKey("lidarr_artists.id"), index=True)
+    recommended_artist_id = Column(Integer, ForeignKey("recommended_artists.id"), index=True)
+    similarity_score = Column(Float, nullable=True)
+
+    lidarr_artist = relationship("LidarrArtist", back_populates="recommendations")
+    recommended_artist = relationship("RecommendedArtist", back_populates="recommendations")
 
 
 class LidarrArtist(Base):
@@ -52,10 +68,12 @@ class LidarrArtist(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
+    name_key = Column(String, index=True, default=name_key_default("name"))
     genres = Column(String)
     mbid = Column(String)
+    recommendations_generated_at = Column(DateTime, nullable=True, index=True)
 
-    recommended_artists = relationship("RecommendedArtist", back_populates="lidarr_artist")
+    recommendations = relationship("ArtistRecommendation", back_populates="lidarr_artist")
 
     def as_dict(self):
         return {
@@ -0,0 +1,168 @@
+import math
+import uuid
+from datetime import datetime, timedelta
+
+from db.database_handler import DatabaseHandler
+from db.task_models import GenerationRun, GenerationRunSeed, TaskRun
+from logger import logger
+from sqlalchemy import delete, insert
+
+# Trends compare the median of the latest runs with the median of the same number of runs before them.
+TREND_WINDOW = 5
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(percent / 100 * len(sorted_values)), 1) - 1]
+
+
+def _trend(values):
+    """Return the percentage change between the median of the latest runs and the runs before them, or None without enough history."""
+    window = min(TREND_WINDOW, len(values) // 2)
+    if not window:
+        return None
+    previous = _percentile(sorted(values[-2 * window : -window]), 50)
+    recent = _percentile(sorted(values[-window:]), 50)
+    if not previous:
+        return None
+    return round((recent - previous) / previous * 100, 1)
+
+
+class TaskDBHandler(DatabaseHandler):
+    def __init__(self):
+        super().__init__()
+
+    def start_or_resume_run(self, task_name, seeds):
+        """Return the unfinished run for a task, adding any new seeds to it, or start a new run."""
+        session = self.SessionLocal()
+        try:
+            run = session.query(GenerationRun).filter(GenerationRun.task_name == task_name, GenerationRun.status == "Running").order_by(GenerationRun.started_at.desc()).first()
+
+            if run:
+                known_seeds = {seed for (seed,) in session.query(GenerationRunSeed.seed).filter(GenerationRunSeed.run_id == run.run_id).all()}
+                logger.info(f"Resuming {task_name} run {run.run_id}")
+            else:
+                run = GenerationRun(run_id=uuid.uuid4().hex, task_name=task_name, status="Running", started_at=datetime.now())
+                session.add(run)
+                session.flush()
+                known_seeds = set()
+                logger.info(f"Starting {task_name} run {run.run_id}")
+
+            new_seeds = [{"run_id": run.run_id, "seed": seed, "state": "pending", "attempts": 0} for seed in dict.fromkeys(seeds) if seed not in known_seeds]
+            if new_seeds:
+                session.execute(insert(GenerationRunSeed), new_seeds)
+
+            session.commit()
+            return run.run_id
+
+        except Exception as e:
+            logger.error(f"Error starting {task_name} run: {str(e)}")
+            session.rollback()
+            raise
+
+        finally:
+            session.close()
+
+    def get_run_seeds(self, run_id):
+        """Return {seed: {"state": state, "attempts": attempts}} for every seed in a run."""
+        session = self.SessionLocal()
+        try:
+            rows = session.query(GenerationRunSeed.seed, GenerationRunSeed.state, GenerationRunSeed.attempts).filter(GenerationRunSeed.run_id == run_id).all()
+            return {seed: {"state": state, "attempts": attempts} for seed, state, attempts in rows}
+
+        finally:
+            session.close()
+
+    def mark_seed(self, run_id, seed, state, error=None):
+        """Record the outcome of one seed, counting an attempt."""
+        session = self.SessionLocal()
+        try:
+            session.query(GenerationRunSeed).filter(GenerationRunSeed.run_id == run_id, GenerationRunSeed.seed == seed).update(
+                {"state": state, "attempts": GenerationRunSeed.attempts + 1, "last_error": error}, synchronize_session=False
+            )
+            session.commit()
+
+        except Exception as e:
+            logger.error(f"Error updating checkpoint for seed '{seed}': {str(e)}")
+            session.rollback()
+
+        finally:
+            session.close()
+
+    def finish_run(self, run_id, status):
+        """Close a run so the next task run starts a fresh checkpoint."""
+        session = self.SessionLocal()
+        try:
+            session.query(GenerationRun).filter(GenerationRun.run_id == run_id).update({"status": status, "finished_at": datetime.now()}, synchronize_session=False)
+            session.commit()
+
+        except Exception as e:
+            logger.error(f"Error finishing run {run_id}: {str(e)}")
+            session.rollback()
+
+        finally:
+            session.close()
+
+    def record_task_run(self, run, retention_days):
+        """Store the outcome of one task run and drop runs older than the retention period."""
+        session = self.SessionLocal()
+        try:
+            session.add(TaskRun(**run))
+            if retention_days:
+                session.execute(delete(TaskRun).where(TaskRun.started_at < datetime.now() - timedelta(days=retention_days)))
+            session.commit()
+
+        except Exception as e:
+            logger.error(f"Error recording run of task {run.get('task_name')}: {str(e)}")
+            session.rollback()
+
+        finally:
+            session.close()
+
+    def get_task_runs(self, task_id, limit=20):
+        """Return the latest runs of a task, newest first."""
+        session = self.SessionLocal()
+        try:
+            runs = session.query(TaskRun).filter(TaskRun.task_id == task_id).order_by(TaskRun.started_at.desc()).limit(limit).all()
+            return [run.as_dict() for run in runs]
+
+        finally:
+            session.close()
+
+    def get_task_run_stats(self):
+        """Return duration and throughput percentiles and trends for every task with recorded runs.
+
+        Percentiles and trends only use completed runs, since stopped or failed runs end early; throughput is items processed per minute.
+        """
+        session = self.SessionLocal()
+        try:
+            rows = session.query(TaskRun.task_id, TaskRun.status, TaskRun.duration_seconds, TaskRun.items_processed).order_by(TaskRun.started_at).all()
+
+        finally:
+            session.close()
+
+        runs_by_task = {}
+        for task_id, status, duration_seconds, items_processed in rows:
+            runs_by_task.setdefault(task_id, []).append((status, duration_seconds or 0, items_processed or 0))
+
+        stats = []
+        for task_id, runs in runs_by_task.items():
+            durations = [duration for status, duration, _ in runs if status == "Completed"]
+            throughputs = [round(items / duration * 60, 1) for status, duration, items in runs if status == "Completed" and items and duration]
+            sorted_durations = sorted(durations)
+            sorted_throughputs = sorted(throughputs)
+            stats.append(
+                {
+                    "task_id": task_id,
+                    "runs": len(runs),
+                    "completed": len(durations),
+                    "duration_p50": _percentile(sorted_durations, 50),
+                    "duration_p90": _percentile(sorted_durations, 90),
+                    "duration_p95": _percentile(sorted_durations, 95),
+                    "throughput_p50": _percentile(sorted_throughputs, 50),
+                    "duration_trend": _trend(durations),
+                    "throughput_trend": _trend(throughputs),
+                }
+            )
+        return stats
@@ -0,0 +1,65 @@
+from db.base import Base
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, UniqueConstraint
+
+
+class GenerationRun(Base):
+    __tablename__ = "generation_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, unique=True, index=True)
+    task_name = Column(String, index=True)
+    status = Column(String, default="Running")
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime, nullable=True)
+
+    def as_dict(self):
+        return {
+            "run_id": self.run_id,
+            "task_name": self.task_name,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class GenerationRunSeed(Base):
+    __tablename__ = "generation_run_seeds"
+    __table_args__ = (UniqueConstraint("run_id", "seed"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, ForeignKey("generation_runs.run_id"), index=True)
+    seed = Column(String)
+    state = Column(String, default="pending")
+    attempts = Column(Integer, default=0)
+    last_error = Column(String, nullable=True)
+
+
+class TaskRun(Base):
+    __tablename__ = "task_runs"
+    __table_args__ = (Index("ix_task_runs_task_id_started_at", "task_id", "started_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer)
+    task_name = Column(String)
+    status = Column(String)
+    started_at = Column(DateTime, index=True)
+    finished_at = Column(DateTime)
+    duration_seconds = Column(Float)
+    items_processed = Column(Integer, default=0)
+    external_calls = Column(Integer, default=0)
+    cache_hits = Column(Integer, default=0)
+    errors = Column(Integer, default=0)
+
+    def as_dict(self):
+        return {
+            "task_id": self.task_id,
+            "task_name": self.task_name,
+            "status": self.status,
+            "started_at": self.started_at.strftime("%d-%B-%Y %H:%M:%S") if self.started_at else None,
+            "finished_at": self.finished_at.strftime("%d-%B-%Y %H:%M:%S") if self.finished_at else None,
+            "duration_seconds": self.duration_seconds,
+            "items_processed": self.items_processed,
+            "external_calls": self.external_calls,
+            "cache_hits": self.cache_hits,
+            "errors": self.errors,
+        }
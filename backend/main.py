@@ -28,6 +28,7 @@ from services.spotdl_download_services import SpotDLDownloadService
 from services.spotify_services import SpotifyService
 from services.tmdb_services import TMDBService
 from services.user_services import UserService
+from utils import fast_json
 
 
 class MediaWolfApp:
@@ -43,7 +44,7 @@ class MediaWolfApp:
         self.app = Flask(__name__, template_folder=template_path, static_folder=static_path)
         self.app.secret_key = os.getenv("flask_secret_key", "secret_key")
         self.app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=7)
-        self.socketio = SocketIO(self.app, cors_allowed_origins="*")
+        self.socketio = SocketIO(self.app, cors_allowed_origins="*", json=fast_json)
 
         self.music_db = MusicDBHandler()
         self.movies_db = MovieDBHandler()
@@ -25,10 +25,35 @@ class Config:
     release_version: str = "NA"
     login_required: bool = False
 
+    # Recommendation generation settings
+    generation_max_attempts: int = 3
+    generation_retry_backoff: int = 30
+    refresh_seeds_per_run: int = 50
+    refresh_time_budget_minutes: int = 60
+    refresh_max_api_calls: int = 0
+    score_seed_weight: float = 0.5
+    score_similarity_weight: float = 0.3
+    score_popularity_weight: float = 0.2
+
+    # Task settings
+    task_max_concurrent_runs: int = 2
+    task_worker_pool_size: int = 10
+    task_history_retention_days: int = 90
+
     # Last FM Settings
     lastfm_api_key: str = ""
     lastfm_api_secret: str = ""
-    lastfm_sleep_interval: int = 300
+    lastfm_requests_per_second: float = 4.0
+    lastfm_thread_limit: int = 4
+    lastfm_cache_ttl_days: int = 30
+    lastfm_cache_max_entries: int = 50000
+
+    # Deezer settings
+    deezer_api_timeout: int = 10
+    deezer_thread_limit: int = 4
+    deezer_requests_per_second: float = 8.0
+    deezer_image_cache_ttl_days: int = 90
+    deezer_image_cache_negative_ttl_days: int = 7
 
     # Lidarr settings
     lidarr_address: str = "http://localhost:8686"
@@ -72,7 +97,11 @@ class Config:
 
     # API keys
     tmdb_api_key: str = ""
-    tmdb_sleep_interval: float = 0.0
+    tmdb_requests_per_second: float = 20.0
+    tmdb_thread_limit: int = 4
+    tmdb_api_timeout: int = 10
+    tmdb_recommendation_pages: int = 1
+    tmdb_include_similar: bool = False
     tvdb_api_key: str = ""
     tvdb_sleep_interval: float = 0.0
 
@@ -0,0 +1,83 @@
+import concurrent.futures
+
+import requests
+from db.cache_db_handler import CacheDBHandler
+from logger import logger
+from requests.adapters import HTTPAdapter
+from utils.rate_limiter import AdaptiveRateLimiter
+from utils.string_cleaner import name_key
+
+# Deezer answers an exhausted per-IP quota (50 requests per 5 seconds) with HTTP 200 and this error code in the body.
+QUOTA_EXCEEDED_CODE = 4
+QUOTA_WINDOW_SECONDS = 5
+
+
+class DeezerService:
+    def __init__(self, cache: CacheDBHandler, timeout=10, thread_limit=4, requests_per_second=8.0):
+        self.cache = cache
+        self.timeout = timeout
+        self.thread_limit = max(int(thread_limit), 1)
+        self.endpoint = "https://api.deezer.com/search/artist"
+        self.max_retries = 3
+        self.rate_limiter = AdaptiveRateLimiter(requests_per_second)
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=self.thread_limit))
+
+    def get_artist_image(self, artist_name):
+        """Resolve a single artist image, returning None when Deezer has no match."""
+        return self.get_artist_images([artist_name]).get(artist_name)
+
+    def get_artist_images(self, artist_names, progress=None):
+        """Resolve images for many artists, serving cached results and fetching the rest concurrently, counting both against the task run when there is one."""
+        artist_names = list(dict.fromkeys(artist_names))
+        cached_images = self.cache.get_artist_images(artist_names)
+        images = {artist_name: cached_images[name_key(artist_name)] for artist_name in artist_names if name_key(artist_name) in cached_images}
+
+        artists_to_fetch = [artist_name for artist_name in artist_names if artist_name not in images]
+        if progress:
+            progress.count("cache_hits", len(images))
+            progress.count("cache_misses", len(artists_to_fetch))
+        if artists_to_fetch:
+            fetched_images = {}
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.thread_limit) as executor:
+                for artist_name, (resolved, image) in zip(artists_to_fetch, executor.map(lambda artist_name: self._fetch_artist_image(artist_name, progress), artists_to_fetch)):
+                    images[artist_name] = image
+                    if resolved:
+                        fetched_images[artist_name] = image
+
+            self.cache.store_artist_images(fetched_images)
+            logger.debug(f"Deezer images: {len(artist_names) - len(artists_to_fetch)} cached, {len(artists_to_fetch)} fetched")
+
+        return images
+
+    def _fetch_artist_image(self, artist_name, progress=None):
+        """Return (resolved, image); resolved is False on request errors and exhausted quota so they are not cached as misses."""
+        try:
+            for attempt in range(self.max_retries):
+                self.rate_limiter.acquire()
+                if progress:
+                    progress.count("external_calls")
+                response = self.session.get(self.endpoint, params={"q": artist_name}, timeout=self.timeout)
+                if response.status_code != 429:
+                    response.raise_for_status()
+                    data = response.json()
+                    if (data.get("error") or {}).get("code") != QUOTA_EXCEEDED_CODE:
+                        break
+
+                logger.warning(f"Deezer quota exceeded, pausing requests for {QUOTA_WINDOW_SECONDS} seconds")
+                self.rate_limiter.backoff(QUOTA_WINDOW_SECONDS)
+            else:
+                logger.error(f"Deezer quota still exceeded for '{artist_name}' after {self.max_retries} attempts")
+                return False, None
+
+            self.rate_limiter.record_success()
+            if "data" in data and data["data"]:
+                artist_info = data["data"][0]
+                return True, artist_info.get("picture_xl") or artist_info.get("picture_large") or artist_info.get("picture_medium") or artist_info.get("picture") or None
+
+            return True, None
+
+        except Exception as e:
+            logger.error(f"Deezer Error for '{artist_name}': {str(e)}")
+            return False, None
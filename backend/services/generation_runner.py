@@ -0,0 +1,115 @@
+import concurrent.futures
+import threading
+import time
+
+from db.task_db_handler import TaskDBHandler
+from logger import logger
+
+
+class GenerationRunner:
+    """Runs a recommendation generation task seed by seed, checkpointing each seed so a restarted run can resume.
+
+    Fetches run on a pool of max_workers threads while results are stored on the calling thread as they arrive.
+    Once the cancel event is set no new seed is started and results still arriving are discarded, leaving those seeds pending for the resumed run.
+    When a TaskProgress is given it is told the number of pending seeds, the seed last started, how many have finished and how many attempts failed.
+    """
+
+    def __init__(self, task_db: TaskDBHandler, task_name, max_attempts=3, retry_backoff=30, max_workers=1):
+        self.task_db = task_db
+        self.task_name = task_name
+        self.max_attempts = max(int(max_attempts), 1)
+        self.retry_backoff = retry_backoff
+        self.max_workers = max(int(max_workers), 1)
+
+    def run(self, seeds, fetch, store, seed_key=str, time_budget=None, cancel_event=None, progress=None, seed_label=None, call_budget=None):
+        """Fetch and store recommendations for every seed not already completed in the current checkpoint.
+
+        When a time budget in seconds is given, no new seed is started once it is spent; likewise for a call budget, once progress has counted that many external calls.
+        seed_label names a seed in progress reports and defaults to its key.
+        A cancelled run is left open so the next run resumes from its checkpoint.
+        """
+        cancel_event = cancel_event or threading.Event()
+        deadline = time.monotonic() + time_budget if time_budget else None
+        budget = (deadline, call_budget if call_budget and progress else None, progress)
+        seeds_by_key = {seed_key(seed): seed for seed in seeds}
+        run_id = self.task_db.start_or_resume_run(self.task_name, list(seeds_by_key))
+        checkpoint = self.task_db.get_run_seeds(run_id)
+        attempts = {key: checkpoint[key]["attempts"] for key in seeds_by_key}
+
+        pending = [key for key in seeds_by_key if checkpoint[key]["state"] != "completed" and attempts[key] < self.max_attempts]
+        logger.info(f"{self.task_name} run {run_id}: {len(pending)} seeds to process, {len(seeds_by_key) - len(pending)} already done")
+        if progress:
+            progress.start(len(pending))
+
+        outcomes = {}
+        retry_round = 0
+        while pending:
+            self._process_round(run_id, pending, seeds_by_key, fetch, store, attempts, outcomes, budget, cancel_event, progress, seed_label)
+
+            pending = [key for key in pending if key in outcomes and not outcomes[key] and attempts[key] < self.max_attempts]
+            if self._budget_spent(*budget) or cancel_event.is_set():
+                pending = []
+            if pending:
+                delay = self.retry_backoff * (2**retry_round)
+                retry_round += 1
+                logger.warning(f"{self.task_name}: retrying {len(pending)} failed seeds in {delay} seconds")
+                cancel_event.wait(delay)
+
+        completed_count = sum(1 for outcome in outcomes.values() if outcome)
+        failed_count = len(outcomes) - completed_count
+        if cancel_event.is_set():
+            logger.info(f"{self.task_name} run {run_id} cancelled: {completed_count} completed, {failed_count} failed, checkpoint kept for the next run")
+        else:
+            self.task_db.finish_run(run_id, "Completed")
+            logger.info(f"{self.task_name} run {run_id} finished: {completed_count} completed, {failed_count} failed")
+        return {"run_id": run_id, "completed": completed_count, "failed": failed_count, "cancelled": cancel_event.is_set()}
+
+    def _budget_spent(self, deadline, call_budget, progress):
+        if deadline is not None and time.monotonic() >= deadline:
+            return True
+        return call_budget is not None and progress.snapshot()["external_calls"] >= call_budget
+
+    def _process_round(self, run_id, keys, seeds_by_key, fetch, store, attempts, outcomes, budget, cancel_event, progress, seed_label):
+        keys_to_submit = iter(keys)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = {}
+            while True:
+                while len(in_flight) < self.max_workers and not self._budget_spent(*budget) and not cancel_event.is_set():
+                    key = next(keys_to_submit, None)
+                    if key is None:
+                        break
+                    attempts[key] += 1
+                    in_flight[executor.submit(fetch, seeds_by_key[key])] = key
+                    if progress:
+                        progress.update(current_item=seed_label(seeds_by_key[key]) if seed_label else key)
+
+                if not in_flight:
+                    if cancel_event.is_set():
+                        logger.info(f"{self.task_name}: cancelled, stopping early")
+                    elif self._budget_spent(*budget):
+                        logger.info(f"{self.task_name}: time or call budget spent, stopping early")
+                    break
+
+                done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    key = in_flight.pop(future)
+                    if cancel_event.is_set():
+                        continue
+                    outcomes[key] = self._store_result(run_id, key, seeds_by_key[key], future, store)
+                    if progress:
+                        if not outcomes[key]:
+                            progress.count("errors")
+                        progress.update(done=len(outcomes))
+
+    def _store_result(self, run_id, key, seed, future, store):
+        try:
+            store(seed, future.result())
+
+        except Exception as e:
+            logger.error(f"{self.task_name}: seed '{key}' failed: {str(e)}")
+            self.task_db.mark_seed(run_id, key, "failed", str(e))
+            return False
+
+        else:
+            self.task_db.mark_seed(run_id, key, "completed")
+            return True
@@ -1,69 +1,103 @@
-import time
+import concurrent.futures
 
 import pylast
-import requests
 from logger import logger
+from utils.rate_limiter import TokenBucket
 
 
 class LastFMService:
-    def __init__(self, api_key, api_secret, rate_limit):
+    def __init__(self, api_key, api_secret, requests_per_second, thread_limit=4, cache=None, image_service=None):
         self.lastfm_network = pylast.LastFMNetwork(api_key=api_key, api_secret=api_secret)
-        self.rate_limit = rate_limit
+        self.cache = cache
+        self.image_service = image_service
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.thread_limit = max(int(thread_limit), 1)
 
-    def generate_recommendations(self, artist_name):
+    def generate_recommendations(self, artist_name, cancel_event=None, progress=None):
         logger.info(f"Searching for new recommendations via LastFM for {artist_name}")
         try:
             artist_obj = self.lastfm_network.get_artist(artist_name)
+            self._acquire(progress)
             related_artists = artist_obj.get_similar()
-            return self._process_related_artists(related_artists)
+            return self._process_related_artists(related_artists, cancel_event, progress)
+
+        except pylast.WSError as e:
+            if str(e.get_id()) != str(pylast.STATUS_INVALID_PARAMS):
+                logger.error(f"Error with LastFM on artist '{artist_name}': {str(e)}")
+                raise
+            logger.warning(f"LastFM has no data for artist '{artist_name}': {str(e)}")
+            return []
 
         except Exception as e:
             logger.error(f"Error with LastFM on artist '{artist_name}': {str(e)}")
-            return []
+            raise
+
+    def _acquire(self, progress=None):
+        """Take a rate limiter token for one Last.fm call, counting it against the task run when there is one."""
+        self.rate_limiter.acquire()
+        if progress:
+            progress.count("external_calls")
+
+    def _process_related_artists(self, related_artists, cancel_event=None, progress=None):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.thread_limit) as executor:
+            results = executor.map(lambda related_artist: self._process_related_artist(related_artist, cancel_event, progress), related_artists)
+            recommended_list = [new_artist for new_artist in results if new_artist]
 
-    def _process_related_artists(self, related_artists):
-        recommended_list = []
-        for related_artist in related_artists:
-            try:
-                artist_obj = self.lastfm_network.get_artist(related_artist.item.name)
-                genres = ", ".join([tag.item.get_name().title() for tag in artist_obj.get_top_tags()[:5]]) or "Unknown Genre"
-                listeners = artist_obj.get_listener_count() or 0
-                play_count = artist_obj.get_playcount() or 0
-                image_link = self._get_artist_image(related_artist.item.name)
-                overview = artist_obj.get_bio_content() or f"No Biography available for: {related_artist.item.name}"
-
-                new_artist = {
-                    "name": related_artist.item.name,
-                    "genre": genres,
-                    "status": "",
-                    "image": image_link if image_link else "https://placehold.co/300x200",
-                    "play_count": play_count,
-                    "listeners": listeners,
-                    "overview": overview,
-                }
-                recommended_list.append(new_artist)
-                logger.info(f"Sleeping for {self.rate_limit} seconds to prevent API Blocking")
-                time.sleep(self.rate_limit)
-
-            except Exception as e:
-                logger.error(f"LastFM Error processing related artist: {str(e)}")
+        if cancel_event and cancel_event.is_set():
+            return recommended_list
+
+        images = self.image_service.get_artist_images([new_artist["name"] for new_artist in recommended_list], progress) if self.image_service else {}
+        for new_artist in recommended_list:
+            new_artist["image"] = images.get(new_artist["name"]) or "https://placehold.co/300x200"
 
         return recommended_list
 
-    def _get_artist_image(self, artist_name):
+    def _process_related_artist(self, related_artist, cancel_event=None, progress=None):
+        if cancel_event and cancel_event.is_set():
+            return None
+
         try:
-            endpoint = "https://api.deezer.com/search/artist"
-            response = requests.get(endpoint, params={"q": artist_name})
-            data = response.json()
+            artist_name = related_artist.item.name
+            metadata = self.cache.get_lastfm_artist(artist_name) if self.cache else None
+
+            if metadata:
+                if progress:
+                    progress.count("cache_hits")
+            else:
+                if progress:
+                    progress.count("cache_misses")
+                metadata = self._get_artist_metadata(artist_name, progress)
+                if self.cache:
+                    self.cache.store_lastfm_artist(artist_name, metadata)
 
-            if "data" in data and data["data"]:
-                artist_info = data["data"][0]
-                return artist_info.get("picture_xl") or artist_info.get("picture_large") or artist_info.get("picture_medium") or artist_info.get("picture", "")
+            return {
+                "name": artist_name,
+                "genre": metadata["genre"],
+                "status": "",
+                "image": "",
+                "play_count": metadata["play_count"],
+                "listeners": metadata["listeners"],
+                "overview": metadata["overview"],
+                "similarity": float(related_artist.match or 0),
+            }
 
         except Exception as e:
-            logger.error(f"Deezer Error: {str(e)}")
+            logger.error(f"LastFM Error processing related artist: {str(e)}")
+            return None
+
+    def _get_artist_metadata(self, artist_name, progress=None):
+        artist_obj = self.lastfm_network.get_artist(artist_name)
+
+        self._acquire(progress)
+        genres = ", ".join([tag.item.get_name().title() for tag in artist_obj.get_top_tags()[:5]]) or "Unknown Genre"
+        self._acquire(progress)
+        listeners = artist_obj.get_listener_count() or 0
+        self._acquire(progress)
+        play_count = artist_obj.get_playcount() or 0
+        self._acquire(progress)
+        overview = artist_obj.get_bio_content() or f"No Biography available for: {artist_name}"
 
-        return None
+        return {"genre": genres, "listeners": listeners, "play_count": play_count, "overview": overview}
 
     def _format_numbers(self, count):
         if count >= 1000000:
@@ -1,17 +1,23 @@
 import concurrent.futures
 import json
 import os
+import threading
 import urllib.parse
 from datetime import datetime
 
 import musicbrainzngs
 import requests
+from db.cache_db_handler import CacheDBHandler
 from db.music_db_handler import MusicDBHandler
+from db.task_db_handler import TaskDBHandler
 from logger import logger
 from services.config_services import Config
+from services.deezer_services import DeezerService
+from services.generation_runner import GenerationRunner
 from services.lastfm_services import LastFMService
 from thefuzz import fuzz
 from unidecode import unidecode
+from utils.task_progress import TaskProgress
 
 
 class LidarrService:
@@ -19,41 +25,109 @@ class LidarrService:
         self.config = config
         self.db = db
         self.thread_limit = 4
-        self.lastfm_service = LastFMService(self.config.lastfm_api_key, self.config.lastfm_api_secret, self.config.lastfm_sleep_interval)
+        self.task_db = TaskDBHandler()
+        self.cache_db = CacheDBHandler(
+            self.config.lastfm_cache_ttl_days,
+            self.config.lastfm_cache_max_entries,
+            self.config.deezer_image_cache_ttl_days,
+            self.config.deezer_image_cache_negative_ttl_days,
+        )
+        self.deezer_service = DeezerService(self.cache_db, self.config.deezer_api_timeout, self.config.deezer_thread_limit, self.config.deezer_requests_per_second)
+        self.lastfm_service = LastFMService(
+            self.config.lastfm_api_key,
+            self.config.lastfm_api_secret,
+            self.config.lastfm_requests_per_second,
+            self.config.lastfm_thread_limit,
+            cache=self.cache_db,
+            image_service=self.deezer_service,
+        )
         self.app_name = "MediaWolf"
         self.app_rev = "0.0.0"
         self.app_url = "mediawolf.github.io"
+        self.lidarr_stop_event = threading.Event()
 
-    def generate_and_store_lastfm_recommendations(self):
+    def generate_and_store_lastfm_recommendations(self, cancel_event=None, progress=None):
+        progress = progress or TaskProgress(None)
         try:
-            lidarr_artists = self.db.get_existing_db_artists()
+            lidarr_artists = self.db.get_lidarr_artists_without_recommendations()
+            logger.info(f"{len(lidarr_artists)} artists need recommendations")
 
-            for artist_name in lidarr_artists:
-                logger.info(f"Processing artist: {artist_name}")
+            runner = GenerationRunner(self.task_db, "artist_recommendations", self.config.generation_max_attempts, self.config.generation_retry_backoff)
+            run_summary = runner.run(lidarr_artists, lambda artist_name: self._fetch_artist_recommendations(artist_name, cancel_event, progress), self._store_artist_recommendations, cancel_event=cancel_event, progress=progress)
+            if run_summary["completed"] and not run_summary["cancelled"]:
+                self.db.reshuffle_recommendations()
+            if run_summary["completed"]:
+                self.db.score_recommendations(self.config.score_seed_weight, self.config.score_similarity_weight, self.config.score_popularity_weight)
 
-                has_existing_recommendations = self.db._get_recommended_artists_for_lidarr_artist(artist_name)
+            self.cache_db.evict_lastfm_artists()
 
-                if not has_existing_recommendations:
-                    recommendations = self.lastfm_service.generate_recommendations(artist_name)
+        except Exception as e:
+            logger.error(f"Error generating and storing LastFM recommendations: {str(e)}")
+            return "Failed"
 
-                    if recommendations:
-                        self.db.store_recommended_artists_for_lidarr_artist(artist_name, recommendations)
-                    else:
-                        logger.warning(f"No recommendations found for artist: {artist_name}")
-                else:
-                    logger.info(f"Artist {artist_name} already has recommendations in the database.")
+        else:
+            return "Stopped" if run_summary["cancelled"] else "Completed"
+
+        finally:
+            counters = progress.snapshot()
+            logger.info(f"LastFM and Deezer caches this run: {counters['cache_hits']} hits, {counters['cache_misses']} misses, {counters['external_calls']} external calls")
+
+    def refresh_stale_lastfm_recommendations(self, cancel_event=None, progress=None):
+        progress = progress or TaskProgress(None)
+        try:
+            lidarr_artists = self.db.get_stalest_lidarr_artists(self.config.refresh_seeds_per_run)
+            logger.info(f"Refreshing recommendations for the {len(lidarr_artists)} stalest artists")
+
+            runner = GenerationRunner(self.task_db, "artist_recommendations_refresh", self.config.generation_max_attempts, self.config.generation_retry_backoff)
+            run_summary = runner.run(
+                lidarr_artists,
+                lambda artist_name: self._fetch_artist_recommendations(artist_name, cancel_event, progress),
+                self._store_artist_recommendations,
+                time_budget=self.config.refresh_time_budget_minutes * 60,
+                cancel_event=cancel_event,
+                progress=progress,
+                call_budget=self.config.refresh_max_api_calls,
+            )
+            if run_summary["completed"] and not run_summary["cancelled"]:
+                self.db.reshuffle_recommendations()
+            if run_summary["completed"]:
+                self.db.score_recommendations(self.config.score_seed_weight, self.config.score_similarity_weight, self.config.score_popularity_weight)
+
+            self.cache_db.evict_lastfm_artists()
 
         except Exception as e:
-            logger.error(f"Error generating and storing LastFM recommendations: {str(e)}")
+            logger.error(f"Error refreshing LastFM recommendations: {str(e)}")
             return "Failed"
 
         else:
-            return "Completed"
+            return "Stopped" if run_summary["cancelled"] else "Completed"
+
+        finally:
+            counters = progress.snapshot()
+            logger.info(f"LastFM and Deezer caches this run: {counters['cache_hits']} hits, {counters['cache_misses']} misses, {counters['external_calls']} external calls")
 
-    def refresh_lidarr_artists(self):
+    def _fetch_artist_recommendations(self, artist_name, cancel_event=None, progress=None):
+        logger.info(f"Processing artist: {artist_name}")
+        return self.lastfm_service.generate_recommendations(artist_name, cancel_event, progress)
+
+    def _store_artist_recommendations(self, artist_name, recommendations):
+        if not recommendations:
+            logger.warning(f"No recommendations found for artist: {artist_name}")
+        # Stored even when empty so the seed is stamped as generated and not picked again by every run.
+        self.db.store_recommended_artists_for_lidarr_artist(artist_name, recommendations or [])
+
+    def refresh_lidarr_artists(self, cancel_event=None, progress=None):
         try:
             updated_lidarr_artists = self._get_artists()
-            self.db.add_lidarr_artists(updated_lidarr_artists)
+            if progress:
+                progress.count("external_calls")
+                progress.start(len(updated_lidarr_artists))
+            if cancel_event and cancel_event.is_set():
+                logger.info("Lidarr sync cancelled before updating the database")
+                return "Stopped"
+            self.db.sync_lidarr_artists(updated_lidarr_artists)
+            if progress:
+                progress.update(done=len(updated_lidarr_artists))
 
         except Exception as e:
             logger.error(f"Error Refreshing Lidarr Artists: {str(e)}")
@@ -161,10 +235,11 @@ class LidarrService:
     def get_wanted_albums_from_lidarr(self):
         try:
             logger.warning(f"Accessing Lidarr API")
+            self.lidarr_stop_event.clear()
             self.lidarr_status = "busy"
             self.lidarr_items = []
             page = 1
-            while True:
+            while not self.lidarr_stop_event.is_set():
                 endpoint = f"{self.config.lidarr_address}/api/v1/wanted/missing?includeArtist=true"
                 params = {"apikey": self.config.lidarr_api_key, "page": page}
                 response = requests.get(endpoint, params=params, timeout=self.config.lidarr_api_timeout)
@@ -212,7 +287,7 @@ class LidarrService:
                 self.lidarr_futures = [executor.submit(self.get_missing_tracks_for_album, album) for album in self.lidarr_items]
                 concurrent.futures.wait(self.lidarr_futures)
 
-            self.lidarr_status = "complete"
+            self.lidarr_status = "stopped" if self.lidarr_stop_event.is_set() else "complete"
 
         except Exception as e:
             logger.error(f"Error Getting Missing Albums: {str(e)}")
@@ -221,7 +296,14 @@ class LidarrService:
         finally:
             return {"status": self.lidarr_status, "data": self.lidarr_items}
 
+    def stop_wanted_albums_from_lidarr(self):
+        """Ask a running wanted albums scan to stop after the current page or album."""
+        self.lidarr_stop_event.set()
+
     def get_missing_tracks_for_album(self, req_album):
+        if self.lidarr_stop_event.is_set():
+            return
+
         logger.warning(f'Reading Missing Track list of {req_album["artist"]} - {req_album["album_name"]} from Lidarr API')
         endpoint = f"{self.config.lidarr_address}/api/v1/track"
         params = {"apikey": self.config.lidarr_api_key, "albumId": req_album["album_id"]}
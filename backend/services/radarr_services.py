@@ -3,10 +3,13 @@ import os
 
 import requests
 from db.movie_db_handler import MovieDBHandler
+from db.task_db_handler import TaskDBHandler
 from logger import logger
 from services.config_services import Config
+from services.generation_runner import GenerationRunner
 from services.tmdb_services import TMDBService
 from unidecode import unidecode
+from utils.task_progress import TaskProgress
 
 
 class RadarrService:
@@ -14,40 +17,92 @@ class RadarrService:
         self.config = config
         self.db = db
         self.tmdb_service = TMDBService(config)
+        self.task_db = TaskDBHandler()
 
-    def generate_and_store_tmbd_recommendations(self):
+    def generate_and_store_tmbd_recommendations(self, cancel_event=None, progress=None):
         try:
-            radarr_movie_items = self.db.get_existing_db_movies()
+            radarr_movie_items = self.db.get_radarr_movies_without_recommendations()
+            logger.info(f"{len(radarr_movie_items)} movies need recommendations")
+
+            runner = GenerationRunner(self.task_db, "movie_recommendations", self.config.generation_max_attempts, self.config.generation_retry_backoff, self.config.tmdb_thread_limit)
+            run_summary = runner.run(
+                radarr_movie_items,
+                lambda movie_item: self._fetch_movie_recommendations(movie_item, cancel_event, progress),
+                self._store_movie_recommendations,
+                seed_key=lambda movie_item: str(movie_item.get("tmdb_id")),
+                cancel_event=cancel_event,
+                progress=progress,
+                seed_label=lambda movie_item: movie_item.get("title"),
+            )
+            if run_summary["completed"] and not run_summary["cancelled"]:
+                self.db.reshuffle_recommendations()
+            if run_summary["completed"]:
+                self.db.score_recommendations(self.config.score_seed_weight, self.config.score_similarity_weight, self.config.score_popularity_weight)
 
-            for movie_item in radarr_movie_items:
-                movie_title = movie_item.get("title")
-                movie_tmdb_id = movie_item.get("tmdb_id")
-                logger.info(f"Processing movie: {movie_title}")
-
-                has_existing_recommendations = self.db._get_recommended_movies_for_radarr_movie(movie_title)
+        except Exception as e:
+            logger.error(f"Error generating and storing TMDB recommendations: {str(e)}")
+            return "Failed"
 
-                if not has_existing_recommendations:
-                    recommendations = self.tmdb_service.generate_recommendations(movie_tmdb_id)
+        else:
+            return "Stopped" if run_summary["cancelled"] else "Completed"
 
-                    if recommendations:
-                        parsed_recommendations = self.tmdb_service.parse_movie_data(recommendations)
-                        self.db.store_recommended_movies_for_radarr_movie(movie_title, parsed_recommendations)
-                    else:
-                        logger.warning(f"No recommendations found for movie: {movie_title}")
-                else:
-                    logger.info(f"Movie {movie_title} already has recommendations in the database.")
+    def refresh_stale_tmdb_recommendations(self, cancel_event=None, progress=None):
+        progress = progress or TaskProgress(None)
+        try:
+            radarr_movie_items = self.db.get_stalest_radarr_movies(self.config.refresh_seeds_per_run)
+            logger.info(f"Refreshing recommendations for the {len(radarr_movie_items)} stalest movies")
+
+            runner = GenerationRunner(self.task_db, "movie_recommendations_refresh", self.config.generation_max_attempts, self.config.generation_retry_backoff, self.config.tmdb_thread_limit)
+            run_summary = runner.run(
+                radarr_movie_items,
+                lambda movie_item: self._fetch_movie_recommendations(movie_item, cancel_event, progress),
+                self._store_movie_recommendations,
+                seed_key=lambda movie_item: str(movie_item.get("tmdb_id")),
+                time_budget=self.config.refresh_time_budget_minutes * 60,
+                cancel_event=cancel_event,
+                progress=progress,
+                seed_label=lambda movie_item: movie_item.get("title"),
+                call_budget=self.config.refresh_max_api_calls,
+            )
+            if run_summary["completed"] and not run_summary["cancelled"]:
+                self.db.reshuffle_recommendations()
+            if run_summary["completed"]:
+                self.db.score_recommendations(self.config.score_seed_weight, self.config.score_similarity_weight, self.config.score_popularity_weight)
 
         except Exception as e:
-            logger.error(f"Error generating and storing LastFM recommendations: {str(e)}")
+            logger.error(f"Error refreshing TMDB recommendations: {str(e)}")
             return "Failed"
 
         else:
-            return "Completed"
+            return "Stopped" if run_summary["cancelled"] else "Completed"
+
+    def _fetch_movie_recommendations(self, movie_item, cancel_event=None, progress=None):
+        logger.info(f"Processing movie: {movie_item.get('title')}")
+        return self.tmdb_service.generate_recommendations(movie_item.get("tmdb_id"), cancel_event, progress)
+
+    def _store_movie_recommendations(self, movie_item, recommendations):
+        parsed_recommendations = []
+        if recommendations:
+            parsed_recommendations = self.tmdb_service.parse_movie_data(recommendations)
+            for rank, parsed_recommendation in enumerate(parsed_recommendations):
+                parsed_recommendation["similarity"] = round(1 - rank / len(parsed_recommendations), 4)
+        else:
+            logger.warning(f"No recommendations found for movie: {movie_item.get('title')}")
+        # Stored even when empty so the seed is stamped as generated and not picked again by every run.
+        self.db.store_recommended_movies_for_radarr_movie(movie_item.get("tmdb_id"), parsed_recommendations)
 
-    def refresh_radarr_movies(self):
+    def refresh_radarr_movies(self, cancel_event=None, progress=None):
         try:
             updated_radarr_movies = self._get_movies()
-            self.db.add_radarr_movies(updated_radarr_movies)
+            if progress:
+                progress.count("external_calls")
+                progress.start(len(updated_radarr_movies))
+            if cancel_event and cancel_event.is_set():
+                logger.info("Radarr sync cancelled before updating the database")
+                return "Stopped"
+            self.db.sync_radarr_movies(updated_radarr_movies)
+            if progress:
+                progress.update(done=len(updated_radarr_movies))
 
         except Exception as e:
             logger.error(f"Error Refreshing Radarr Movies: {str(e)}")
@@ -62,6 +117,7 @@ class RadarrService:
             endpoint = f"{self.config.radarr_address}/api/v3/movie"
             headers = {"X-Api-Key": self.config.radarr_api_key}
             response = requests.get(endpoint, headers=headers, timeout=self.config.radarr_api_timeout)
+            response.raise_for_status()
 
             if response.status_code == 200:
                 return response.json() or []
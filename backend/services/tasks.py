@@ -1,18 +1,29 @@
 import json
 import os
-from dataclasses import asdict, dataclass
+import threading
+import time
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from typing import Dict, List, Optional
 
 import logger
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from db.task_db_handler import TaskDBHandler
 from logger import logger
 from services.config_services import Config
 from services.lidarr_services import LidarrService
 from services.radarr_services import RadarrService
 from services.readarr_services import ReadarrService
 from services.sonarr_services import SonarrService
+from utils.task_progress import TaskProgress
+
+PROGRESS_PUSH_INTERVAL_SECONDS = 1.0
+# Crons the dependent tasks had before dependencies existed, when they were chained by hour offsets.
+LEGACY_DEPENDENT_CRONS = {2: "0 2 * * *", 4: "0 4 * * *", 6: "0 6 * * *", 8: "0 8 * * *"}
+QUEUE_POLL_SECONDS = 1.0
 
 
 @dataclass
@@ -24,6 +35,11 @@ class Task:
     function_name: str
     last_run: str
     status: str = "Scheduled"
+    depends_on: List[int] = field(default_factory=list)
+    max_instances: int = 1
+    coalesce: bool = True
+    misfire_grace_time: int = 600
+    timeout_minutes: int = 120
 
     def to_dict(self):
         return asdict(self)
@@ -33,27 +49,38 @@ class Task:
         """Return a list of default tasks."""
         return [
             cls(1, "Lidarr Sync", "0 1 * * *", "Refreshes Lidarr artist list.", "lidarr_sync", ""),
-            cls(2, "Artist Recommendations", "0 2 * * *", "Generates artist recommendations list.", "generate_artist_recommendations", ""),
+            cls(2, "Artist Recommendations", "", "Generates artist recommendations list.", "generate_artist_recommendations", "", depends_on=[1], timeout_minutes=480),
             cls(3, "Radarr Sync", "0 3 * * *", "Updates Radarr movie database.", "radarr_sync", ""),
-            cls(4, "Movie Recommendations", "0 4 * * *", "Generates movie recommendations list.", "generate_movie_recommendations", ""),
+            cls(4, "Movie Recommendations", "", "Generates movie recommendations list.", "generate_movie_recommendations", "", depends_on=[3], timeout_minutes=480),
             cls(5, "Sonarr Sync", "0 5 * * *", "Syncs Sonarr series list.", "sonarr_sync", ""),
-            cls(6, "TV Recommendations", "0 6 * * *", "Generates tv recommendations list.", "generate_tv_recommendations", ""),
+            cls(6, "TV Recommendations", "", "Generates tv recommendations list.", "generate_tv_recommendations", "", depends_on=[5]),
             cls(7, "Readarr Sync", "0 7 * * *", "Updates Readarr book collection.", "readarr_sync", ""),
-            cls(8, "Book Recommendations", "0 8 * * *", "Generates book recommendations list.", "generate_book_recommendations", ""),
+            cls(8, "Book Recommendations", "", "Generates book recommendations list.", "generate_book_recommendations", "", depends_on=[7]),
             cls(9, "Spotify Sync", "0 9 * * *", "Syncs Spotify playlists.", "spotify_sync", ""),
             cls(10, "YouTube Sync", "0 10 * * *", "Syncs YouTube playlists and channels.", "youtube_sync", ""),
+            cls(11, "Artist Recommendations Refresh", "0 11 * * *", "Refreshes the stalest artist recommendations.", "refresh_artist_recommendations", ""),
+            cls(12, "Movie Recommendations Refresh", "0 12 * * *", "Refreshes the stalest movie recommendations.", "refresh_movie_recommendations", ""),
         ]
 
 
 class Tasks:
-    def __init__(self, config: Config, lidarr_service: LidarrService, radarr_service: RadarrService, readarr_service: ReadarrService, sonarr_service: SonarrService):
+    def __init__(self, config: Config, lidarr_service: LidarrService, radarr_service: RadarrService, readarr_service: ReadarrService, sonarr_service: SonarrService, progress_callback=None):
         self.lidarr_service = lidarr_service
         self.radarr_service = radarr_service
         self.readarr_service = readarr_service
         self.sonarr_service = sonarr_service
         self.config = config
+        self.task_db = TaskDBHandler()
         self.tasks: Dict[int, Task] = {}
-        self.scheduler = BackgroundScheduler()
+        self.run_slots = threading.BoundedSemaphore(max(int(config.task_max_concurrent_runs), 1))
+        self.running_instances: Dict[int, int] = {}
+        self.cancel_events: Dict[int, threading.Event] = {}
+        self.abandoned_runs: Dict[threading.Thread, int] = {}
+        self.progress_callback = progress_callback
+        self.progress: Dict[int, TaskProgress] = {}
+        self.running_instances_lock = threading.Lock()
+        self.scheduler = BackgroundScheduler(executors={"default": ThreadPoolExecutor(max(int(config.task_worker_pool_size), 1))})
+        self.scheduler.add_listener(self.handle_skipped_job, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
         self.scheduler.start()
 
         self.load_tasks()
@@ -65,14 +92,27 @@ class Tasks:
             try:
                 with open(self.config.TASKS_CONFIG_FILE_NAME, "r") as f:
                     tasks_data = json.load(f)
+                    default_tasks = {task.id: task for task in Task.default_tasks()}
                     self.tasks = {}
                     for task_id, data in tasks_data.items():
+                        default_task = default_tasks.get(int(task_id))
+                        if "depends_on" not in data and default_task and default_task.depends_on:
+                            if data.get("cron") == LEGACY_DEPENDENT_CRONS.get(int(task_id)):
+                                logger.info(f"Task '{task_id}' now runs after tasks {default_task.depends_on} instead of on its old default cron '{data['cron']}'")
+                                data.update(cron=default_task.cron, depends_on=default_task.depends_on)
+                            else:
+                                logger.info(f"Task '{task_id}' keeps its custom cron '{data.get('cron')}' without dependencies")
+                                data["depends_on"] = []
+                        if default_task:
+                            for key, value in default_task.to_dict().items():
+                                data.setdefault(key, value)
                         task = Task(**data)
-                        if task.status == "Running":
+                        if task.status in ("Running", "Queued", "Stopping"):
                             task.status = "Scheduled"
                         self.tasks[int(task_id)] = task
 
                 logger.info("Tasks loaded from file.")
+                self.add_missing_default_tasks()
 
             except (json.JSONDecodeError, FileNotFoundError) as e:
                 logger.error(f"Error loading tasks: {e}")
@@ -87,6 +127,15 @@ class Tasks:
         self.save_tasks()
         logger.info("Default tasks created and saved.")
 
+    def add_missing_default_tasks(self):
+        """Add default tasks introduced after the tasks file was created."""
+        missing_tasks = [task for task in Task.default_tasks() if task.id not in self.tasks]
+        if missing_tasks:
+            for task in missing_tasks:
+                self.tasks[task.id] = task
+            self.save_tasks()
+            logger.info(f"Added {len(missing_tasks)} new default tasks.")
+
     def save_tasks(self):
         """Save tasks to JSON file."""
         try:
@@ -127,6 +176,10 @@ class Tasks:
         if self.scheduler.get_job(job_id):
             self.scheduler.remove_job(job_id)
 
+        if not task_data["cron"]:
+            logger.info(f"Task '{task_id}' has no cron and runs after tasks {task_data.get('depends_on', [])}")
+            return
+
         try:
             self.scheduler.add_job(
                 func=self.run_task,
@@ -134,6 +187,9 @@ class Tasks:
                 id=job_id,
                 replace_existing=True,
                 kwargs={"task_id": task_id},
+                max_instances=task_data["max_instances"],
+                coalesce=task_data["coalesce"],
+                misfire_grace_time=task_data["misfire_grace_time"],
             )
             logger.info(f"Task '{task_id}' scheduled with cron: {task_data['cron']}")
 
@@ -153,27 +209,163 @@ class Tasks:
             logger.error(f"Task '{task_id}' not found!")
             return
 
+        with self.running_instances_lock:
+            already_running = self.running_instances.get(task_id, 0) >= task.max_instances
+            if not already_running:
+                self.running_instances[task_id] = self.running_instances.get(task_id, 0) + 1
+                cancel_event = self.cancel_events.setdefault(task_id, threading.Event())
+
+        if already_running:
+            # The status belongs to the run in progress, so the skip is only logged.
+            logger.warning(f"Skipped task {task.name}: {task.max_instances} run(s) already in progress")
+            return
+
+        result = {"holds_slot": self.run_slots.acquire(blocking=False)}
+        if not result["holds_slot"]:
+            logger.info(f"Task {task.name} queued, all run slots are busy")
+            task.status = "Queued"
+            self.save_tasks()
+            while not result["holds_slot"] and not cancel_event.is_set():
+                result["holds_slot"] = self.run_slots.acquire(timeout=QUEUE_POLL_SECONDS)
+
+        if cancel_event.is_set():
+            logger.info(f"Task {task.name} stopped before it started")
+            self._release_run(task_id, result)
+            task.status = "Stopped"
+            self.save_tasks()
+            return
+
         logger.info(f"Running task: {task.name}")
         task.status = "Running"
         self.save_tasks()
 
+        progress = TaskProgress(task_id, self.progress_callback, PROGRESS_PUSH_INTERVAL_SECONDS)
+        self.progress[task_id] = progress
+        progress.start()
+        started_at = datetime.now()
+        started_monotonic = time.monotonic()
+
+        worker = threading.Thread(target=self._execute_task, args=(task, cancel_event, progress, result), name=f"task-{task_id}", daemon=True)
+        result.update(worker=worker, started_at=started_at, started_monotonic=started_monotonic)
+        worker.start()
+        worker.join(timeout=task.timeout_minutes * 60 if task.timeout_minutes else None)
+
+        if worker.is_alive() and self._release_run(task_id, result, abandon=True):
+            logger.error(f"Task {task.name} timed out after {task.timeout_minutes} minutes, cancelling it and freeing its run slot")
+            cancel_event.set()
+            task.status = "Timed Out"
+        elif cancel_event.is_set():
+            task.status = "Stopped"
+        else:
+            task.status = result.get("status", "Error")
+
+        timestamp = datetime.now()
+        task.last_run = timestamp.strftime("%d-%B-%Y %H:%M:%S")
+        self.save_tasks()
+        if task.status in ("Failed", "Error"):
+            progress.count("errors")
+        progress.finish(task.status)
+        if self.progress.get(task_id) is progress:
+            del self.progress[task_id]
+        self.record_run(task, progress, started_at, timestamp, time.monotonic() - started_monotonic)
+
+        if task.status == "Completed":
+            self.start_dependent_tasks(task_id)
+
+    def _execute_task(self, task, cancel_event, progress, result):
+        """Run the task function on its own thread so run_task can stop waiting for it at the timeout."""
         try:
             func_name = task.function_name
             if hasattr(self, func_name):
                 func = getattr(self, func_name)
-                ret_status = func()
-                task.status = ret_status
-                logger.info(f"Task {task_id}: {task.name} - {ret_status}")
+                ret_status = func(cancel_event, progress)
+                result["status"] = ret_status
+                logger.info(f"Task {task.id}: {task.name} - {ret_status}")
             else:
-                logger.error(f"Function {func_name} not found for task '{task_id}'")
+                logger.error(f"Function {func_name} not found for task '{task.id}'")
 
         except Exception as e:
-            logger.error(f"Error running task '{task_id}': {e}")
-            task.status = "Error"
-
-        timestamp = datetime.now()
-        task.last_run = timestamp.strftime("%d-%B-%Y %H:%M:%S")
-        self.save_tasks()
+            logger.error(f"Error running task '{task.id}': {e}")
+            result["status"] = "Error"
+
+        finally:
+            if not self._release_run(task.id, result):
+                finished_at = datetime.now()
+                logger.warning(f"Task {task.name} finished after it timed out with status {result.get('status', 'Error')}")
+                self.record_run(task, progress, result["started_at"], finished_at, time.monotonic() - result["started_monotonic"], status="Finished After Timeout")
+
+    def record_run(self, task, progress, started_at, finished_at, duration_seconds, status=None):
+        """Add a finished run with its counters to the run history."""
+        snapshot = progress.snapshot()
+        run = {
+            "task_id": task.id,
+            "task_name": task.name,
+            "status": status or task.status,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "duration_seconds": round(duration_seconds, 3),
+            "items_processed": snapshot["done"],
+            "external_calls": snapshot["external_calls"],
+            "cache_hits": snapshot["cache_hits"],
+            "errors": snapshot["errors"],
+        }
+        self.task_db.record_task_run(run, self.config.task_history_retention_days)
+
+    def _release_run(self, task_id, result, abandon=False):
+        """Free the run slot and instance of a run once; returns False when they were already freed, abandoning a timed-out worker with abandon set."""
+        with self.running_instances_lock:
+            if result.get("released"):
+                self.abandoned_runs.pop(result.get("worker"), None)
+                return False
+            result["released"] = True
+            if abandon:
+                self.abandoned_runs[result["worker"]] = task_id
+            if result["holds_slot"]:
+                self.run_slots.release()
+            self.running_instances[task_id] -= 1
+            if not self.running_instances[task_id]:
+                self.cancel_events.pop(task_id, None)
+        return True
+
+    def stop_task(self, task_id):
+        """Ask the running or queued runs of a task to stop; returns False when none is active."""
+        job = self.scheduler.get_job(f"task_{task_id}_now")
+        if job:
+            job.remove()
+
+        with self.running_instances_lock:
+            cancel_event = self.cancel_events.get(task_id)
+        if not cancel_event:
+            return False
+
+        logger.info(f"Stop requested for task {self.tasks[task_id].name}")
+        cancel_event.set()
+        return True
+
+    def handle_skipped_job(self, event):
+        """Log a fire APScheduler dropped for missing its grace time or exceeding max_instances, marking the task skipped unless a run is active."""
+        task_id = int(event.job_id.split("_")[1])
+        task = self.get_task(task_id)
+        if task:
+            logger.warning(f"Skipped scheduled run of task {task.name} ({'missed' if event.code == EVENT_JOB_MISSED else 'already running'})")
+            with self.running_instances_lock:
+                active = self.running_instances.get(task_id, 0) > 0
+            if not active:
+                task.status = "Skipped"
+                self.save_tasks()
+
+    def start_task(self, task_id):
+        """Queue a one-off run of a task on the scheduler, leaving its cron schedule in place."""
+        self.scheduler.add_job(func=self.run_task, trigger="date", id=f"task_{task_id}_now", replace_existing=True, kwargs={"task_id": task_id})
+
+    def start_dependent_tasks(self, task_id):
+        """Start every enabled task whose dependencies have all completed, now that the given task has."""
+        for dependent in self.tasks.values():
+            if task_id not in dependent.depends_on or dependent.status in ("Disabled", "Queued", "Running", "Stopping"):
+                continue
+            if all(self.tasks[dependency].status == "Completed" for dependency in dependent.depends_on if dependency in self.tasks):
+                logger.info(f"Starting task {dependent.name} after {self.tasks[task_id].name}")
+                self.start_task(dependent.id)
 
     def get_task(self, task_id: str) -> Optional[Task]:
         """Retrieve a task by ID."""
@@ -183,61 +375,85 @@ class Tasks:
         """Return all tasks."""
         return [task.to_dict() for task in self.tasks.values()]
 
-    def lidarr_sync(self):
+    def get_run_history(self, task_id, limit=20):
+        """Return the latest recorded runs of a task."""
+        return self.task_db.get_task_runs(task_id, limit)
+
+    def get_run_stats(self):
+        """Return duration and throughput percentiles and trends for every task."""
+        return self.task_db.get_task_run_stats()
+
+    def list_progress(self):
+        """Return the progress of every running task."""
+        return [progress.snapshot() for progress in list(self.progress.values())]
+
+    def lidarr_sync(self, cancel_event, progress):
         logger.info("Starting Lidarr Sync...")
-        ret_status = self.lidarr_service.refresh_lidarr_artists()
+        ret_status = self.lidarr_service.refresh_lidarr_artists(cancel_event, progress)
         logger.info(f"Lidarr Sync: {ret_status}")
         return ret_status
 
-    def generate_artist_recommendations(self):
+    def generate_artist_recommendations(self, cancel_event, progress):
         logger.info("Starting to Generate Artist Recommendations...")
-        ret_status = self.lidarr_service.generate_and_store_lastfm_recommendations()
+        ret_status = self.lidarr_service.generate_and_store_lastfm_recommendations(cancel_event, progress)
         logger.info(f"Generation of Artist Recommendations: {ret_status}")
         return ret_status
 
-    def radarr_sync(self):
+    def refresh_artist_recommendations(self, cancel_event, progress):
+        logger.info("Starting to Refresh Artist Recommendations...")
+        ret_status = self.lidarr_service.refresh_stale_lastfm_recommendations(cancel_event, progress)
+        logger.info(f"Refresh of Artist Recommendations: {ret_status}")
+        return ret_status
+
+    def radarr_sync(self, cancel_event, progress):
         logger.info("Running Radarr Sync...")
-        ret_status = self.radarr_service.refresh_radarr_movies()
+        ret_status = self.radarr_service.refresh_radarr_movies(cancel_event, progress)
         logger.info(f"Radarr Sync: {ret_status}")
         return ret_status
 
-    def generate_movie_recommendations(self):
+    def generate_movie_recommendations(self, cancel_event, progress):
         logger.info("Starting to Generate Movie Recommendations...")
-        ret_status = self.radarr_service.generate_and_store_tmbd_recommendations()
+        ret_status = self.radarr_service.generate_and_store_tmbd_recommendations(cancel_event, progress)
         logger.info(f"Generation of Movie Recommendations: {ret_status}")
         return ret_status
 
-    def sonarr_sync(self):
+    def refresh_movie_recommendations(self, cancel_event, progress):
+        logger.info("Starting to Refresh Movie Recommendations...")
+        ret_status = self.radarr_service.refresh_stale_tmdb_recommendations(cancel_event, progress)
+        logger.info(f"Refresh of Movie Recommendations: {ret_status}")
+        return ret_status
+
+    def sonarr_sync(self, cancel_event, progress):
         logger.info("Starting Sonarr Sync...")
         ret_status = "Completed"  #  self.sonarr_service.refresh_sonarr_series()
         logger.info(f"Sonarr Sync: {ret_status}")
         return ret_status
 
-    def generate_tv_recommendations(self):
+    def generate_tv_recommendations(self, cancel_event, progress):
         logger.info("Starting to Generate TV Recommendations...")
         ret_status = "Completed"  # self.sonarr_service.generate_and_store_tv_recommendations()
         logger.info(f"Generation of TV Recommendations: {ret_status}")
         return ret_status
 
-    def readarr_sync(self):
+    def readarr_sync(self, cancel_event, progress):
         logger.info("Starting Readarr Sync...")
         ret_status = "Completed"  #  self.readarr_service.refresh_readarr_books()
         logger.info(f"Readarr Sync: {ret_status}")
         return ret_status
 
-    def generate_book_recommendations(self):
+    def generate_book_recommendations(self, cancel_event, progress):
         logger.info("Starting to Generate Book Recommendations...")
         ret_status = "Completed"  #  self.readarr_service.generate_and_store_book_recommendations()
         logger.info(f"Generation of Book Recommendations: {ret_status}")
         return ret_status
 
-    def spotify_sync(self):
+    def spotify_sync(self, cancel_event, progress):
         logger.info("Starting Spotify Sync...")
         ret_status = "Completed"  # self.spotify_service.sync_spotify_playlists()
         logger.info(f"Spotify Sync: {ret_status}")
         return ret_status
 
-    def youtube_sync(self):
+    def youtube_sync(self, cancel_event, progress):
         logger.info("Starting YouTube Sync...")
         ret_status = "Completed"  #  self.youtube_service.sync_youtube_playlists_and_channels()
         logger.info(f"YouTube Sync: {ret_status}")
@@ -1,41 +1,90 @@
-import time
-
 import requests
 from logger import logger
+from requests.adapters import HTTPAdapter
 from services.config_services import Config
+from utils.rate_limiter import AdaptiveRateLimiter
 
 
 class TMDBService:
     def __init__(self, config: Config):
         self.config = config
+        self.base_url = "https://api.themoviedb.org/3"
+        self.max_retries = 5
+        self.rate_limiter = AdaptiveRateLimiter(self.config.tmdb_requests_per_second)
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=max(int(self.config.tmdb_thread_limit), 1)))
+
+    def _get(self, path, params=None, progress=None):
+        """GET a TMDB endpoint through the shared rate limiter, waiting out 429 responses and counting each request against the task run when there is one."""
+        request_params = {"api_key": self.config.tmdb_api_key, **(params or {})}
+
+        for attempt in range(self.max_retries):
+            self.rate_limiter.acquire()
+            if progress:
+                progress.count("external_calls")
+            response = self.session.get(f"{self.base_url}{path}", params=request_params, timeout=self.config.tmdb_api_timeout)
+
+            if response.status_code != 429:
+                self.rate_limiter.record_success()
+                return response
+
+            retry_after = self._parse_retry_after(response.headers.get("Retry-After"), attempt)
+            logger.warning(f"TMDB rate limit hit, pausing requests for {retry_after} seconds")
+            self.rate_limiter.backoff(retry_after)
+
+        return response
 
-    def generate_recommendations(self, movie_id):
+    def _parse_retry_after(self, header_value, attempt):
         try:
-            url = f"https://api.themoviedb.org/3/movie/{movie_id}/recommendations"
-            params = {"api_key": self.config.tmdb_api_key}
-            response = requests.get(url, params=params)
-            data = response.json()
-            ret_list = []
+            return max(float(header_value), 0.0)
+        except (TypeError, ValueError):
+            return float(2**attempt)
 
-            for movie in data["results"]:
-                ret_list.append(movie)
+    def generate_recommendations(self, movie_id, cancel_event=None, progress=None):
+        """Collect candidates from the configured pages of /recommendations and optionally /similar, deduplicated by TMDB ID.
 
-            logger.info(f"Sleeping for {self.config.tmdb_sleep_interval} seconds to prevent rate limiting")
-            time.sleep(self.config.tmdb_sleep_interval)
+        Pages are fetched one after another; seeds already run on tmdb_thread_limit workers, which is what the connection pool is sized for.
+        """
+        endpoints = ["recommendations", "similar"] if self.config.tmdb_include_similar else ["recommendations"]
+        requests_to_make = [(endpoint, page) for endpoint in endpoints for page in range(1, max(int(self.config.tmdb_recommendation_pages), 1) + 1)]
 
-            return ret_list
+        try:
+            pages = [self._get_movie_list(movie_id, endpoint, page, cancel_event, progress) for endpoint, page in requests_to_make]
 
         except Exception as e:
             logger.error(f"Error with TMDB on movie '{movie_id}': {str(e)}")
+            raise
+
+        ret_list = []
+        seen_ids = set()
+        for movies in pages:
+            for movie in movies:
+                if movie.get("id") not in seen_ids:
+                    seen_ids.add(movie.get("id"))
+                    ret_list.append(movie)
+
+        logger.debug(f"TMDB returned {len(ret_list)} unique candidates for movie '{movie_id}' from {len(requests_to_make)} requests")
+        return ret_list
+
+    def _get_movie_list(self, movie_id, endpoint, page, cancel_event=None, progress=None):
+        if cancel_event and cancel_event.is_set():
             return []
 
+        response = self._get(f"/movie/{movie_id}/{endpoint}", {"page": page}, progress)
+        if response.status_code == 404:
+            logger.warning(f"TMDB has no {endpoint} for movie '{movie_id}'")
+            return []
+
+        response.raise_for_status()
+        return response.json().get("results", [])
+
     def perform_movie_search(self, query):
         try:
             parsed_results = None
             logger.info(f"Search query: {query}")
 
-            url = f"https://api.themoviedb.org/3/search/movie?api_key={self.config.tmdb_api_key}&query={query}"
-            response = requests.get(url)
+            response = self._get("/search/movie", {"query": query})
             response.raise_for_status()
 
             results = response.json()
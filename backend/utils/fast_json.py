@@ -0,0 +1,23 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj, *args, **kwargs):
+    """Serialize obj with orjson, falling back to the standard library for anything orjson rejects."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:
+            pass
+    return json.dumps(obj, *args, **kwargs)
+
+
+def loads(data, *args, **kwargs):
+    """Parse a JSON document with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data, *args, **kwargs)
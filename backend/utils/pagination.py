@@ -0,0 +1,81 @@
+import base64
+import json
+import random
+
+from sqlalchemy import and_, or_, tuple_
+
+SHUFFLE_KEY_BITS = 62
+SHUFFLE_SESSION_IDLE_SECONDS = 30 * 60
+
+
+def encode_cursor(position):
+    """Pack a paging position into an opaque string for the client to send back."""
+    if position is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Unpack a cursor from encode_cursor, returning None for missing or malformed cursors."""
+    if not cursor:
+        return None
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return position if isinstance(position, dict) else None
+    except Exception:
+        return None
+
+
+def keyset_page(query, sort_column, key_column, descending, num_results, cursor=None):
+    """Return one page ordered by (sort_column, key_column) after the cursor position, plus the cursor for the next page.
+
+    Rows repeating the (sort value, key) pair of the row before them are skipped, so duplicates of one item are served once.
+    NULL sort values are paged too: they come first in ascending order and last in descending order, as SQLite sorts them.
+    """
+    position = decode_cursor(cursor)
+    last_served = (position["value"], position["key"]) if position else None
+    order_by = [sort_column.desc().nulls_last(), key_column.desc()] if descending else [sort_column.asc().nulls_first(), key_column.asc()]
+
+    rows = []
+    while len(rows) < num_results:
+        page_query = query
+        if last_served is not None:
+            page_query = page_query.filter(_after_position(sort_column, key_column, descending, *last_served))
+
+        batch = page_query.order_by(*order_by).limit(num_results).all()
+        for row in batch:
+            row_position = (getattr(row, sort_column.key), getattr(row, key_column.key))
+            if row_position == last_served:
+                continue
+            rows.append(row)
+            last_served = row_position
+            if len(rows) == num_results:
+                break
+
+        if len(batch) < num_results and len(rows) < num_results:
+            return rows, None
+
+    return rows, encode_cursor({"value": last_served[0], "key": last_served[1]})
+
+
+def _after_position(sort_column, key_column, descending, value, key):
+    """Filter for rows strictly after (value, key) in keyset order, treating NULL sort values as the lowest."""
+    key_after = key_column < key if descending else key_column > key
+    if value is None:
+        # Every non-NULL value comes before the NULL block when descending and after it when ascending.
+        same_block = and_(sort_column.is_(None), key_after)
+        return same_block if descending else or_(same_block, sort_column.is_not(None))
+
+    bound = tuple_(sort_column, key_column)
+    return or_(bound < tuple_(value, key), sort_column.is_(None)) if descending else bound > tuple_(value, key)
+
+
+def random_shuffle_key():
+    """Random position of a recommendation in the shuffled "all" view."""
+    return random.getrandbits(SHUFFLE_KEY_BITS)
+
+
+def shuffle_start_key(seed=None):
+    """Starting point in the shuffle key space; the same seed always starts at the same place."""
+    generator = random.Random(seed) if seed is not None else random
+    return generator.getrandbits(SHUFFLE_KEY_BITS)
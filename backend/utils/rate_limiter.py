@@ -0,0 +1,65 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker calling the same API."""
+
+    def __init__(self, requests_per_second, burst=None):
+        self.rate = max(float(requests_per_second), 0.01)
+        self.capacity = max(float(burst if burst is not None else requests_per_second), 1.0)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.last_refill = now
+
+    def acquire(self, tokens=1):
+        """Block until the requested number of tokens is available."""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_time = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait_time)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """Token bucket that pauses and slows down when the API answers 429, then recovers gradually."""
+
+    def __init__(self, requests_per_second, burst=None, min_requests_per_second=0.5):
+        super().__init__(requests_per_second, burst)
+        self.max_rate = self.rate
+        self.min_rate = min(float(min_requests_per_second), self.max_rate)
+        self.blocked_until = 0.0
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                wait_time = self.blocked_until - time.monotonic()
+            if wait_time <= 0:
+                break
+            time.sleep(wait_time)
+
+        super().acquire(tokens)
+
+    def backoff(self, retry_after):
+        """Block every caller for retry_after seconds and halve the request rate."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.last_refill = self.blocked_until
+
+    def record_success(self):
+        """Step the request rate back towards its configured maximum."""
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
@@ -0,0 +1,79 @@
+import json
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """Thread-safe LRU cache of serialized result pages, keyed by a normalised filter dict.
+
+    Each entry is tagged with the items it contains so a change to one item only evicts the pages that show it.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max(int(max_entries), 1)
+        self.entries = OrderedDict()
+        self.keys_by_tag = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(filters):
+        """Build a stable key from a filter dict, ignoring empty values so equivalent requests share an entry."""
+        return json.dumps({name: value for name, value in filters.items() if value not in (None, "")}, sort_keys=True, default=str)
+
+    def get(self, key):
+        """Return the cached value for a key, or None on a miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, tags=()):
+        """Store a value, evicting the least recently used entry when the cache is full."""
+        with self.lock:
+            self._remove(key)
+            tags = frozenset(tags)
+            self.entries[key] = (value, tags)
+            for tag in tags:
+                self.keys_by_tag.setdefault(tag, set()).add(key)
+
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate_tag(self, tag):
+        """Drop every entry tagged with the given item and return how many were dropped."""
+        with self.lock:
+            keys = self.keys_by_tag.pop(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        """Drop every entry, keeping the hit and miss counters."""
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_tag.clear()
+
+    def stats(self):
+        """Return the entry count and hit/miss counters."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+
+        for tag in entry[1]:
+            keys = self.keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_tag[tag]
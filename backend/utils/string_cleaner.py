@@ -20,3 +20,10 @@ def string_cleaner(input_string):
             normalised_string = unidecode.unidecode(stripped_string)
             cleaned_strings.append(normalised_string)
         return cleaned_strings
+
+
+def name_key(input_string):
+    if not input_string:
+        return ""
+    temp_string = re.sub(r"\s+", " ", unidecode.unidecode(input_string))
+    return temp_string.strip().casefold()
@@ -0,0 +1,94 @@
+import threading
+import time
+
+from logger import logger
+
+
+class TaskProgress:
+    """Thread-safe progress of one task run, pushed to a callback at most once per min_interval seconds.
+
+    Services call start and update as they work; start, finish and the first update after each interval are pushed, everything in between is coalesced.
+    Counters of external calls, cache hits and misses and errors ride along in every snapshot so the run history can record them.
+    """
+
+    def __init__(self, task_id, callback=None, min_interval=1.0):
+        self.task_id = task_id
+        self.callback = callback
+        self.min_interval = min_interval
+        self.status = "Running"
+        self.total = None
+        self.done = 0
+        self.current_item = None
+        self.started_at = time.monotonic()
+        self.last_push = None
+        self.counters = {"external_calls": 0, "cache_hits": 0, "cache_misses": 0, "errors": 0}
+        self.lock = threading.Lock()
+
+    def start(self, total=None):
+        """Reset the counters for a run of total items, or of an unknown number of items."""
+        with self.lock:
+            self.total = total
+            self.done = 0
+            self.current_item = None
+            self.started_at = time.monotonic()
+        self._push(force=True)
+
+    def update(self, done=None, current_item=None):
+        """Record how many items are done and which item is being worked on."""
+        with self.lock:
+            if done is not None:
+                self.done = done
+            if current_item is not None:
+                self.current_item = current_item
+        self._push()
+
+    def count(self, counter, amount=1):
+        """Add to one of the run counters."""
+        with self.lock:
+            self.counters[counter] += amount
+
+    def finish(self, status):
+        """Record the final status of the run and push it straight away."""
+        with self.lock:
+            self.status = status
+            self.current_item = None
+        self._push(force=True)
+
+    def snapshot(self):
+        """Return the progress as a dict, with the rate per minute and ETA in seconds derived from the time since start."""
+        with self.lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        elapsed_minutes = (time.monotonic() - self.started_at) / 60
+        rate_per_minute = self.done / elapsed_minutes if self.done and elapsed_minutes > 0 else None
+        eta_seconds = None
+        if rate_per_minute and self.total is not None and self.status == "Running":
+            eta_seconds = round(max(self.total - self.done, 0) / rate_per_minute * 60)
+        return {
+            "task_id": self.task_id,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "current_item": self.current_item,
+            "rate_per_minute": round(rate_per_minute, 1) if rate_per_minute else None,
+            "eta_seconds": eta_seconds,
+            **self.counters,
+        }
+
+    def _push(self, force=False):
+        if self.callback is None:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            if not force and self.last_push is not None and now - self.last_push < self.min_interval:
+                return
+            self.last_push = now
+            snapshot = self._snapshot()
+
+        try:
+            self.callback(snapshot)
+
+        except Exception as e:
+            logger.error(f"Error pushing progress for task {self.task_id}: {str(e)}")
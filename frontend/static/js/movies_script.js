@@ -1,5 +1,8 @@
 import { socket } from './socket_script.js';
 
+// Random browsing picks one of a few fixed seeds so first pages repeat and are served from the server's result cache.
+const SHUFFLE_SEED_COUNT = 16;
+
 function addToRadarr(movieTitle, movieYear, tmdbId) {
     if (socket.connected) {
         socket.emit('add_movie_to_radarr', encodeURIComponent(movieTitle), movieYear, tmdbId);
@@ -207,11 +210,15 @@ class MovieRecommendationsTab {
         this.currentPage = 1;
         this.numResults = 10;
         this.loading = false;
+        this.seed = null;
+        this.cursor = null;
 
         socket.on('movie_recommendations', (data) => {
             const movieRow = document.getElementById('movie-row');
             if (this.currentPage === 1) movieRow.innerHTML = "";
             this.appendMovies(data.data);
+            this.cursor = data.cursor || null;
+            if (data.request) this.restoreRequest(data.request);
             this.loading = false;
         });
 
@@ -286,14 +293,26 @@ class MovieRecommendationsTab {
         });
     }
 
+    restoreRequest(request) {
+        // Reloaded pages resume scrolling with the filters and seed the cursor was issued for.
+        this.seed = request.seed ?? null;
+        if (request.selected_movie) document.getElementById("movie-select").value = request.selected_movie;
+        if (request.sort_by) document.getElementById("sort-select").value = request.sort_by;
+        document.getElementById("min-popularity").value = request.min_popularity ?? "";
+        document.getElementById("min-vote-average").value = request.min_vote_average ?? "";
+    }
+
     getRecommendations(loadMore = false) {
+        if (this.loading || (loadMore && !this.cursor)) return;
+
         if (!loadMore) {
             this.currentPage = 1;
+            this.seed = Math.floor(Math.random() * SHUFFLE_SEED_COUNT);
+            this.cursor = null;
         } else {
             this.currentPage++;
         }
 
-        if (this.loading) return;
         this.loading = true;
 
         const data = {
@@ -302,7 +321,8 @@ class MovieRecommendationsTab {
             min_popularity: parseFloat(document.getElementById("min-popularity").value) || null,
             min_vote_average: parseFloat(document.getElementById("min-vote-average").value) || null,
             num_results: this.numResults,
-            page: this.currentPage,
+            seed: this.seed,
+            cursor: loadMore ? this.cursor : null,
         };
 
         socket.emit("refresh_movie_recommendations", data);
@@ -313,8 +333,7 @@ class MovieRecommendationsTab {
         const observer = new IntersectionObserver((entries) => {
             const entry = entries[0];
 
-            const movieSelected = document.getElementById("movie-select").value && document.getElementById("movie-select").value !== "all";
-            if (!movieSelected && entry.isIntersecting && !this.loading) {
+            if (entry.isIntersecting && !this.loading) {
                 this.getRecommendations(true);
             }
         });
@@ -1,5 +1,8 @@
 import { socket } from './socket_script.js';
 
+// Random browsing picks one of a few fixed seeds so first pages repeat and are served from the server's result cache.
+const SHUFFLE_SEED_COUNT = 16;
+
 export class MusicPage {
     constructor() {
         this.tabs = {
@@ -214,11 +217,15 @@ class MusicRecommendationsTab {
         this.currentPage = 1;
         this.numResults = 10;
         this.loading = false;
+        this.seed = null;
+        this.cursor = null;
 
         socket.on('music_recommendations', (data) => {
             const artistRow = document.getElementById('artist-row');
             if (this.currentPage === 1) artistRow.innerHTML = "";
             this.appendArtists(data.data);
+            this.cursor = data.cursor || null;
+            if (data.request) this.restoreRequest(data.request);
             this.loading = false;
         });
 
@@ -316,8 +323,8 @@ class MusicRecommendationsTab {
             artistCol.querySelector('.dismiss-artist-btn').addEventListener('click', (event) => {
                 this.dismissArtist(event, artist);
             });
-            artistCol.querySelector('.listeners').textContent = artist.listeners;
-            artistCol.querySelector('.play-count').textContent = artist.play_count;
+            artistCol.querySelector('.listeners').textContent = `Listeners: ${this.formatCount(artist.listeners)}`;
+            artistCol.querySelector('.play-count').textContent = `Play Count: ${this.formatCount(artist.play_count)}`;
 
             var addButton = artistCol.querySelector('.add-to-lidarr-btn');
             if (artist.status === "Added" || artist.status === "Already in Lidarr") {
@@ -339,14 +346,26 @@ class MusicRecommendationsTab {
         });
     }
 
+    restoreRequest(request) {
+        // Reloaded pages resume scrolling with the filters and seed the cursor was issued for.
+        this.seed = request.seed ?? null;
+        if (request.selected_artist) document.getElementById("artist-select").value = request.selected_artist;
+        if (request.sort_by) document.getElementById("sort-select").value = request.sort_by;
+        document.getElementById("min-play-count").value = request.min_play_count ?? "";
+        document.getElementById("min-listeners").value = request.min_listeners ?? "";
+    }
+
     getRecommendations(loadMore = false) {
+        if (this.loading || (loadMore && !this.cursor)) return;
+
         if (!loadMore) {
             this.currentPage = 1;
+            this.seed = Math.floor(Math.random() * SHUFFLE_SEED_COUNT);
+            this.cursor = null;
         } else {
             this.currentPage++;
         }
 
-        if (this.loading) return;
         this.loading = true;
 
         const data = {
@@ -355,7 +374,8 @@ class MusicRecommendationsTab {
             min_play_count: parseInt(document.getElementById("min-play-count").value) || null,
             min_listeners: parseInt(document.getElementById("min-listeners").value) || null,
             num_results: this.numResults,
-            page: this.currentPage,
+            seed: this.seed,
+            cursor: loadMore ? this.cursor : null,
         };
 
         socket.emit("refresh_music_recommendations", data);
@@ -366,8 +386,7 @@ class MusicRecommendationsTab {
         const observer = new IntersectionObserver((entries) => {
             const entry = entries[0];
 
-            const artistSelected = document.getElementById("artist-select").value && document.getElementById("artist-select").value !== "all";
-            if (!artistSelected && entry.isIntersecting && !this.loading) {
+            if (entry.isIntersecting && !this.loading) {
                 this.getRecommendations(true);
             }
         });
@@ -392,6 +411,16 @@ class MusicRecommendationsTab {
         }
     }
 
+    formatCount(count) {
+        count = count || 0;
+        if (count >= 1_000_000) {
+            return `${(count / 1_000_000).toFixed(1)}M`;
+        } else if (count >= 1_000) {
+            return `${(count / 1_000).toFixed(1)}K`;
+        }
+        return String(count);
+    }
+
     updateStep(input) {
         let value = parseInt(input.value);
         input.step = value >= 10_000_000 ? 1_000_000 :
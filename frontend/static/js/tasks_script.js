@@ -9,10 +9,26 @@ export class TasksPage {
         socket.on('update_task', (task) => {
             this.updateTask(task)
         });
+
+        socket.on('task_progress', (progress) => {
+            this.updateProgress(progress);
+        });
+
+        socket.on('load_task_stats', (stats) => {
+            this.renderStats(stats);
+        });
+
+        socket.on('load_task_history', (history) => {
+            this.renderHistory(history);
+        });
+
+        this.tasks = [];
+        this.historyTaskId = null;
     }
 
     init() {
         socket.emit("request_tasks")
+        socket.emit("request_task_stats");
     }
 
     updateTask(task) {
@@ -20,11 +36,136 @@ export class TasksPage {
 
         if (row) {
             row.querySelector('.task-name').textContent = task.name;
-            row.querySelector('.task-cron').textContent = task.cron;
+            row.querySelector('.task-cron').value = task.cron;
             row.querySelector('.task-status').textContent = task.status;
         }
     }
 
+    updateProgress(progress) {
+        const row = document.querySelector(`#task-row-${progress.task_id}`);
+        if (!row) {
+            return;
+        }
+
+        row.querySelector('.task-status').textContent = progress.status;
+        if (progress.status !== 'Running') {
+            socket.emit("request_task_stats");
+            if (this.historyTaskId === progress.task_id) {
+                this.showHistory(progress.task_id);
+            }
+        }
+
+        const bar = row.querySelector('.task-progress .progress');
+        const barFill = bar.querySelector('.progress-bar');
+        const running = progress.status === 'Running';
+        if (progress.total !== null) {
+            const percent = progress.total ? Math.min(100, Math.round((progress.done / progress.total) * 100)) : 100;
+            barFill.style.width = `${percent}%`;
+            bar.setAttribute('aria-valuenow', percent);
+            bar.classList.remove('d-none');
+        }
+        barFill.classList.toggle('progress-bar-animated', running);
+
+        const details = [];
+        if (progress.total !== null) {
+            details.push(`${progress.done}/${progress.total}`);
+        }
+        if (progress.rate_per_minute) {
+            details.push(`${progress.rate_per_minute}/min`);
+        }
+        if (running && progress.eta_seconds !== null) {
+            details.push(`ETA ${this.formatDuration(progress.eta_seconds)}`);
+        }
+        if (running && progress.current_item) {
+            details.push(progress.current_item);
+        }
+        row.querySelector('.task-progress-text').textContent = details.join(' · ');
+    }
+
+    formatDuration(totalSeconds) {
+        const seconds = Math.round(totalSeconds);
+        const hours = Math.floor(seconds / 3600);
+        const minutes = Math.floor((seconds % 3600) / 60);
+        if (hours) {
+            return `${hours}h ${minutes}m`;
+        }
+        return minutes ? `${minutes}m ${seconds % 60}s` : `${seconds}s`;
+    }
+
+    formatTrend(trend, higherIsBetter) {
+        if (trend === null) {
+            return { text: '-', className: '' };
+        }
+        const worse = higherIsBetter ? trend < 0 : trend > 0;
+        return { text: `${trend > 0 ? '+' : ''}${trend}%`, className: trend === 0 ? '' : (worse ? 'text-danger' : 'text-success') };
+    }
+
+    renderStats(stats) {
+        const tableBody = document.getElementById('task-stats-table');
+        tableBody.innerHTML = '';
+
+        stats.forEach(taskStats => {
+            const task = this.tasks.find(other => other.id === taskStats.task_id);
+            const row = document.createElement('tr');
+            const durationTrend = this.formatTrend(taskStats.duration_trend, false);
+            const throughputTrend = this.formatTrend(taskStats.throughput_trend, true);
+            const cells = [
+                { text: task ? task.name : `Task ${taskStats.task_id}` },
+                { text: taskStats.runs },
+                { text: taskStats.completed },
+                { text: taskStats.duration_p50 !== null ? this.formatDuration(taskStats.duration_p50) : '-' },
+                { text: taskStats.duration_p90 !== null ? this.formatDuration(taskStats.duration_p90) : '-' },
+                { text: taskStats.duration_p95 !== null ? this.formatDuration(taskStats.duration_p95) : '-' },
+                durationTrend,
+                { text: taskStats.throughput_p50 !== null ? `${taskStats.throughput_p50.toFixed(1)}/min` : '-' },
+                throughputTrend,
+            ];
+            cells.forEach(cell => {
+                const td = document.createElement('td');
+                td.textContent = cell.text;
+                if (cell.className) {
+                    td.className = cell.className;
+                }
+                row.appendChild(td);
+            });
+            tableBody.appendChild(row);
+        });
+    }
+
+    showHistory(taskId) {
+        this.historyTaskId = taskId;
+        socket.emit("request_task_history", taskId);
+    }
+
+    renderHistory(history) {
+        const task = this.tasks.find(other => other.id === history.task_id);
+        document.getElementById('task-history-title').textContent = `Run History: ${task ? task.name : history.task_id}`;
+
+        const tableBody = document.getElementById('task-history-table');
+        tableBody.innerHTML = '';
+
+        history.runs.forEach(run => {
+            const row = document.createElement('tr');
+            [
+                run.started_at,
+                run.finished_at,
+                run.duration_seconds !== null ? this.formatDuration(run.duration_seconds) : '-',
+                run.items_processed,
+                run.external_calls,
+                run.cache_hits,
+                run.errors,
+                run.status,
+            ].forEach(value => {
+                const td = document.createElement('td');
+                td.textContent = value;
+                row.appendChild(td);
+            });
+            tableBody.appendChild(row);
+        });
+
+        document.getElementById('task-history').classList.remove('d-none');
+    }
+
     manualStart(taskId) {
         socket.emit("task_manual_start", taskId);
     }
@@ -57,6 +198,7 @@ export class TasksPage {
     }
 
     renderTasks(tasks) {
+        this.tasks = tasks;
         const tableBody = document.getElementById('tasks-table');
         tableBody.innerHTML = '';
 
@@ -66,6 +208,10 @@ export class TasksPage {
 
             newRow.querySelector('.task-name').textContent = task.name;
             newRow.querySelector('.task-cron').value = task.cron;
+            if (task.depends_on && task.depends_on.length) {
+                const dependencyNames = tasks.filter(other => task.depends_on.includes(other.id)).map(other => other.name);
+                newRow.querySelector('.task-cron').placeholder = `After ${dependencyNames.join(", ")}`;
+            }
             newRow.querySelector('.task-last-run').textContent = task.last_run;
             newRow.querySelector('.task-status').textContent = task.status;
 
@@ -77,6 +223,7 @@ export class TasksPage {
             newRow.querySelector('.btn-secondary').addEventListener('click', () => this.disableTask(task.id));
             newRow.querySelector('.btn-info').addEventListener('click', () => this.enableTask(task.id));
             newRow.querySelector('.save-cron-btn').addEventListener('click', () => this.saveCron(task.id));
+            newRow.querySelector('.history-btn').addEventListener('click', () => this.showHistory(task.id));
 
             tableBody.appendChild(newRow);
         });
@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+from db.base import Base
+from db.music_models import RecommendedArtist
+from sqlalchemy import create_engine, func, insert, text
+from sqlalchemy.orm import sessionmaker
+from utils.string_cleaner import name_key
+
+row_count = 100_000
+lookup_count = 200
+
+engine = create_engine("sqlite://")
+Base.metadata.create_all(engine)
+Session = sessionmaker(bind=engine)
+session = Session()
+
+names = [f"Artíst Nümber {index}" for index in range(row_count)]
+session.execute(insert(RecommendedArtist), [{"name": name, "listeners": index, "play_count": index} for index, name in enumerate(names)])
+session.commit()
+
+lookups = [names[index].upper() for index in range(0, row_count, row_count // lookup_count)]
+
+
+def benchmark(label, build_filter):
+    plan = session.execute(text(f"EXPLAIN QUERY PLAN {session.query(RecommendedArtist.id).filter(build_filter(lookups[0])).statement.compile(compile_kwargs={'literal_binds': True})}")).fetchall()
+    started = time.perf_counter()
+    for lookup in lookups:
+        session.query(RecommendedArtist.id).filter(build_filter(lookup)).all()
+    elapsed = time.perf_counter() - started
+    print(f"{label}: {elapsed / len(lookups) * 1000:.3f} ms per lookup ({plan[0][-1]})")
+
+
+print(f"{row_count} recommended artists, {len(lookups)} lookups")
+benchmark("func.lower(name)", lambda lookup: func.lower(RecommendedArtist.name) == lookup.lower())
+benchmark("name_key", lambda lookup: RecommendedArtist.name_key == name_key(lookup))
+session.close()
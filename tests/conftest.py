@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend")))
+import logger  # noqa: E402,F401  Loads the config module first, which the backend modules import through the logger.
+from db.database_handler import get_engine  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Engine and session factory of a fresh, fully migrated database in a temporary directory."""
+    return get_engine(f"sqlite:///{tmp_path / 'mediawolf_test.db'}")
@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+from db.task_db_handler import TaskDBHandler
+from services.generation_runner import GenerationRunner
+from utils.task_progress import TaskProgress
+
+
+@pytest.fixture
+def task_db(database):
+    handler = TaskDBHandler.__new__(TaskDBHandler)
+    handler.engine, handler.SessionLocal = database
+    return handler
+
+
+def test_cancelled_run_resumes_with_the_failed_and_unfinished_seeds(task_db):
+    cancel_event = threading.Event()
+    fetched = []
+
+    def fetch(seed):
+        fetched.append(seed)
+        if seed == "c":
+            cancel_event.set()
+        return [seed]
+
+    def store(seed, recommendations):
+        if seed == "b":
+            raise RuntimeError("store failed")
+
+    progress = TaskProgress("generation")
+    first = GenerationRunner(task_db, "test_generation", max_attempts=3, retry_backoff=0).run(["a", "b", "c"], fetch, store, cancel_event=cancel_event, progress=progress)
+
+    assert first["cancelled"]
+    assert (first["completed"], first["failed"]) == (1, 1)
+    assert progress.snapshot()["errors"] == 1
+    checkpoint = task_db.get_run_seeds(first["run_id"])
+    assert {seed: (state["state"], state["attempts"]) for seed, state in checkpoint.items()} == {"a": ("completed", 1), "b": ("failed", 1), "c": ("pending", 0)}
+
+    fetched.clear()
+    second = GenerationRunner(task_db, "test_generation", max_attempts=3, retry_backoff=0).run(["a", "b", "c"], fetch=lambda seed: fetched.append(seed) or [seed], store=lambda seed, recommendations: None)
+
+    assert second["run_id"] == first["run_id"]
+    assert sorted(fetched) == ["b", "c"]
+    assert (second["completed"], second["failed"], second["cancelled"]) == (2, 0, False)
+    assert task_db.get_run_seeds(second["run_id"])["b"] == {"state": "completed", "attempts": 2}
+
+    third = GenerationRunner(task_db, "test_generation").run(["a"], fetch=lambda seed: [seed], store=lambda seed, recommendations: None)
+    assert third["run_id"] != first["run_id"]
+
+
+def test_failed_seed_is_retried_until_max_attempts(task_db):
+    attempts = []
+
+    def fetch(seed):
+        attempts.append(seed)
+        raise RuntimeError("lookup failed")
+
+    summary = GenerationRunner(task_db, "test_retries", max_attempts=3, retry_backoff=0).run(["a"], fetch, lambda seed, recommendations: None)
+
+    assert attempts == ["a", "a", "a"]
+    assert (summary["completed"], summary["failed"]) == (0, 1)
+    assert task_db.get_run_seeds(summary["run_id"])["a"]["attempts"] == 3
+
+
+def test_call_budget_stops_new_seeds(task_db):
+    progress = TaskProgress("refresh")
+
+    def fetch(seed):
+        progress.count("external_calls", 2)
+        return [seed]
+
+    summary = GenerationRunner(task_db, "test_budget").run(["a", "b", "c", "d"], fetch, lambda seed, recommendations: None, progress=progress, call_budget=3)
+
+    assert summary["completed"] == 2
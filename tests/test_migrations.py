@@ -0,0 +1,96 @@
+import pytest
+from db.base import Base
+from db.migrations import MIGRATIONS, run_migrations
+from sqlalchemy import create_engine, text
+
+# The schema create_all built before any migration existed.
+BASELINE_SCHEMA = [
+    "CREATE TABLE dismissed_artists (id INTEGER NOT NULL, name VARCHAR, PRIMARY KEY (id))",
+    "CREATE UNIQUE INDEX ix_dismissed_artists_name ON dismissed_artists (name)",
+    "CREATE TABLE lidarr_artists (id INTEGER NOT NULL, name VARCHAR, genres VARCHAR, mbid VARCHAR, PRIMARY KEY (id))",
+    "CREATE UNIQUE INDEX ix_lidarr_artists_name ON lidarr_artists (name)",
+    "CREATE TABLE dismissed_movies (id INTEGER NOT NULL, title VARCHAR, PRIMARY KEY (id))",
+    "CREATE UNIQUE INDEX ix_dismissed_movies_title ON dismissed_movies (title)",
+    "CREATE TABLE radarr_movies (id INTEGER NOT NULL, title VARCHAR, genres VARCHAR, tmdb_id INTEGER, PRIMARY KEY (id))",
+    "CREATE UNIQUE INDEX ix_radarr_movies_title ON radarr_movies (title)",
+    "CREATE TABLE recommended_artists (id INTEGER NOT NULL, name VARCHAR, genre VARCHAR, listeners INTEGER, play_count INTEGER, image VARCHAR, overview VARCHAR, status VARCHAR, "
+    "lidarr_artist_id INTEGER, PRIMARY KEY (id), FOREIGN KEY(lidarr_artist_id) REFERENCES lidarr_artists (id))",
+    "CREATE INDEX ix_recommended_artists_name ON recommended_artists (name)",
+    "CREATE TABLE recommended_movies (id INTEGER NOT NULL, title VARCHAR, genres VARCHAR, original_language VARCHAR, popularity FLOAT, vote_average FLOAT, vote_count INTEGER, "
+    "first_air_date VARCHAR, year VARCHAR, tmdb_id INTEGER, image VARCHAR, overview VARCHAR, status VARCHAR, radarr_movie_id INTEGER, PRIMARY KEY (id), "
+    "FOREIGN KEY(radarr_movie_id) REFERENCES radarr_movies (id))",
+    "CREATE INDEX ix_recommended_movies_title ON recommended_movies (title)",
+]
+
+BASELINE_ROWS = [
+    "INSERT INTO lidarr_artists (id, name) VALUES (1, 'Seed One'), (2, 'Seed Two'), (3, 'Owned Artist')",
+    "INSERT INTO dismissed_artists (id, name) VALUES (1, 'Dismissed Artist')",
+    "INSERT INTO recommended_artists (id, name, listeners, play_count, status, lidarr_artist_id) VALUES "
+    "(1, 'Shared Artist', 10, 100, '', 1), (2, 'shared artist', 10, 100, 'Added', 2), (3, 'Owned Artist', 5, 50, '', 1), (4, 'Dismissed Artist', 1, 1, '', 2)",
+    "INSERT INTO radarr_movies (id, title, tmdb_id) VALUES (1, 'Seed Movie', 42), (2, 'Seed Movie (Duplicate)', 42), (3, 'Other Movie', 0)",
+    "INSERT INTO recommended_movies (id, title, popularity, tmdb_id, status, radarr_movie_id) VALUES "
+    "(1, 'Shared Movie', 2.5, 7, '', 1), (2, 'Shared Movie', 2.5, 7, '', 3), (3, 'Orphaned By Duplicate', 1.0, 8, '', 2)",
+]
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA + BASELINE_ROWS:
+            connection.execute(text(statement))
+    run_migrations(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _rows(engine, query):
+    with engine.connect() as connection:
+        return connection.execute(text(query)).fetchall()
+
+
+def test_baseline_database_is_stamped_with_the_latest_version(baseline_engine):
+    assert _rows(baseline_engine, "PRAGMA user_version")[0][0] == MIGRATIONS[-1][0]
+
+
+def test_duplicate_recommendations_collapse_into_one_catalog_row_per_item(baseline_engine):
+    artists = _rows(baseline_engine, "SELECT name_key, status FROM recommended_artists WHERE name_key = 'shared artist'")
+    assert len(artists) == 1
+    assert artists[0].status == "Added"
+    artist_seeds = _rows(
+        baseline_engine,
+        "SELECT lidarr_artist_id FROM artist_recommendations JOIN recommended_artists ON recommended_artists.id = recommended_artist_id WHERE name_key = 'shared artist' ORDER BY lidarr_artist_id",
+    )
+    assert [row.lidarr_artist_id for row in artist_seeds] == [1, 2]
+
+    movies = _rows(baseline_engine, "SELECT id FROM recommended_movies WHERE tmdb_id = 7")
+    assert len(movies) == 1
+    assert len(_rows(baseline_engine, f"SELECT * FROM movie_recommendations WHERE recommended_movie_id = {movies[0].id}")) == 2
+
+
+def test_radarr_movies_are_deduplicated_on_tmdb_id(baseline_engine):
+    assert [tuple(row) for row in _rows(baseline_engine, "SELECT id, tmdb_id FROM radarr_movies ORDER BY id")] == [(1, 42), (3, None)]
+    assert not _rows(baseline_engine, "SELECT * FROM recommended_movies WHERE tmdb_id = 8")
+
+
+def test_flags_and_scores_are_backfilled(baseline_engine):
+    flags = {row.name_key: (row.in_library, row.dismissed, row.score) for row in _rows(baseline_engine, "SELECT name_key, in_library, dismissed, score FROM recommended_artists")}
+    assert flags["owned artist"] == (1, 0, 0)
+    assert flags["dismissed artist"] == (0, 1, 0)
+    assert flags["shared artist"] == (0, 0, 0)
+    assert all(row.shuffle_key is not None for row in _rows(baseline_engine, "SELECT shuffle_key FROM recommended_artists"))
+
+
+def test_rerunning_migrations_is_a_no_op(baseline_engine):
+    before = _rows(baseline_engine, "SELECT id, name_key, shuffle_key FROM recommended_artists ORDER BY id")
+    run_migrations(baseline_engine)
+    assert _rows(baseline_engine, "SELECT id, name_key, shuffle_key FROM recommended_artists ORDER BY id") == before
+
+
+def test_new_database_is_only_stamped(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    run_migrations(engine, new_database=True)
+    assert _rows(engine, "PRAGMA user_version")[0][0] == MIGRATIONS[-1][0]
+    assert not _rows(engine, "SELECT name FROM sqlite_master WHERE type = 'table'")
+    engine.dispose()
@@ -0,0 +1,57 @@
+import pytest
+from db.music_models import RecommendedArtist
+from sqlalchemy import insert
+from utils.pagination import decode_cursor, encode_cursor, keyset_page
+
+PLAY_COUNTS = {"alpha": None, "bravo": 5, "charlie": 5, "delta": None, "echo": 3, "foxtrot": 5, "golf": None, "hotel": 9, "india": 3}
+
+
+@pytest.fixture
+def session(database):
+    _, SessionLocal = database
+    session = SessionLocal()
+    session.execute(insert(RecommendedArtist), [{"name": name, "name_key": name, "play_count": play_count} for name, play_count in PLAY_COUNTS.items()])
+    session.commit()
+    yield session
+    session.close()
+
+
+def _expected_order(descending):
+    """NULLs sort first ascending and last descending, ties broken by the key in the same direction."""
+    nulls = sorted((name for name, value in PLAY_COUNTS.items() if value is None), reverse=descending)
+    values = sorted(((value, name) for name, value in PLAY_COUNTS.items() if value is not None), reverse=descending)
+    names = [name for _, name in values]
+    return names + nulls if descending else nulls + names
+
+
+def _page_through(session, descending, page_size):
+    names, cursor, pages = [], None, 0
+    while True:
+        query = session.query(RecommendedArtist.name_key, RecommendedArtist.play_count)
+        rows, cursor = keyset_page(query, RecommendedArtist.play_count, RecommendedArtist.name_key, descending, page_size, cursor)
+        names.extend(row.name_key for row in rows)
+        pages += 1
+        assert pages <= len(PLAY_COUNTS) + 1, "paging did not terminate"
+        if cursor is None:
+            return names
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("page_size", [1, 2, 4, 20])
+def test_keyset_page_covers_nulls_and_ties_without_duplicates_or_gaps(session, descending, page_size):
+    assert _page_through(session, descending, page_size) == _expected_order(descending)
+
+
+def test_keyset_page_resumes_from_a_cursor_inside_the_null_block(session):
+    query = session.query(RecommendedArtist.name_key, RecommendedArtist.play_count)
+    cursor = encode_cursor({"value": None, "key": "alpha"})
+
+    rows, _ = keyset_page(query, RecommendedArtist.play_count, RecommendedArtist.name_key, False, 3, cursor)
+
+    assert [row.name_key for row in rows] == ["delta", "golf", "echo"]
+
+
+def test_malformed_cursors_decode_to_none():
+    assert decode_cursor("not a cursor") is None
+    assert decode_cursor(encode_cursor(None)) is None
+    assert decode_cursor(encode_cursor({"value": 5, "key": "bravo"})) == {"value": 5, "key": "bravo"}
@@ -0,0 +1,109 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from services.deezer_services import DeezerService
+from services.tmdb_services import TMDBService
+from utils.rate_limiter import AdaptiveRateLimiter, TokenBucket
+from utils.task_progress import TaskProgress
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, *args, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def _elapsed(action):
+    started = time.monotonic()
+    action()
+    return time.monotonic() - started
+
+
+def test_token_bucket_serves_the_burst_then_waits_for_refill():
+    bucket = TokenBucket(20, burst=2)
+
+    assert _elapsed(lambda: [bucket.acquire() for _ in range(2)]) < 0.02
+    assert _elapsed(bucket.acquire) >= 0.04
+
+
+def test_backoff_blocks_every_caller_and_halves_the_rate():
+    limiter = AdaptiveRateLimiter(100, min_requests_per_second=30)
+
+    limiter.backoff(0.1)
+
+    assert limiter.rate == 50
+    assert _elapsed(limiter.acquire) >= 0.09
+    limiter.backoff(0)
+    assert limiter.rate == 30
+
+
+def test_record_success_steps_the_rate_back_to_its_maximum():
+    limiter = AdaptiveRateLimiter(10)
+    limiter.backoff(0)
+
+    for _ in range(20):
+        limiter.record_success()
+
+    assert limiter.rate == 10
+
+
+@pytest.fixture
+def tmdb_service():
+    config = SimpleNamespace(tmdb_requests_per_second=100, tmdb_thread_limit=1, tmdb_api_key="key", tmdb_api_timeout=1)
+    return TMDBService(config)
+
+
+def test_tmdb_waits_out_retry_after_before_retrying(tmdb_service):
+    tmdb_service.session = FakeSession([FakeResponse(429, headers={"Retry-After": "0.1"}), FakeResponse(200)])
+    progress = TaskProgress("tmdb")
+
+    started = time.monotonic()
+    response = tmdb_service._get("/movie/1/recommendations", progress=progress)
+
+    assert response.status_code == 200
+    assert time.monotonic() - started >= 0.09
+    assert progress.snapshot()["external_calls"] == 2
+
+
+@pytest.mark.parametrize("header_value, attempt, expected", [("3", 0, 3.0), ("-1", 0, 0.0), (None, 2, 4.0), ("Wed, 21 Oct 2026 07:28:00 GMT", 1, 2.0)])
+def test_tmdb_retry_after_parsing(tmdb_service, header_value, attempt, expected):
+    assert tmdb_service._parse_retry_after(header_value, attempt) == expected
+
+
+def test_deezer_backs_off_on_quota_errors_and_retries(monkeypatch):
+    service = DeezerService(cache=None, requests_per_second=100)
+    backoffs = []
+    monkeypatch.setattr(service.rate_limiter, "backoff", backoffs.append)
+    service.session = FakeSession([FakeResponse(body={"error": {"code": 4}}), FakeResponse(429), FakeResponse(body={"data": [{"picture_xl": "image.jpg"}]})])
+    progress = TaskProgress("deezer")
+
+    assert service._fetch_artist_image("Artist", progress) == (True, "image.jpg")
+    assert len(backoffs) == 2
+    assert progress.snapshot()["external_calls"] == 3
+
+
+def test_deezer_leaves_the_artist_unresolved_when_the_quota_stays_exceeded(monkeypatch):
+    service = DeezerService(cache=None, requests_per_second=100)
+    monkeypatch.setattr(service.rate_limiter, "backoff", lambda retry_after: None)
+    service.session = FakeSession([FakeResponse(body={"error": {"code": 4}})] * service.max_retries)
+
+    assert service._fetch_artist_image("Artist") == (False, None)
+    assert service.session.calls == service.max_retries
@@ -0,0 +1,46 @@
+from utils.result_cache import ResultCache
+
+
+def test_invalidate_tag_drops_only_the_pages_showing_the_item():
+    cache = ResultCache()
+    cache.put("page-1", ["a", "b"], tags={"a", "b"})
+    cache.put("page-2", ["c"], tags={"c", "seed:x"})
+    cache.put("page-3", ["b", "c"], tags={"b", "c"})
+
+    assert cache.invalidate_tag("b") == 2
+
+    assert cache.get("page-1") is None
+    assert cache.get("page-3") is None
+    assert cache.get("page-2") == ["c"]
+    assert cache.invalidate_tag("b") == 0
+
+
+def test_seed_tag_invalidation_keeps_the_item_tags_of_other_pages_consistent():
+    cache = ResultCache()
+    cache.put("seed-page", ["a"], tags={"a", "seed:x"})
+    cache.put("all-page", ["a"], tags={"a"})
+
+    cache.invalidate_tag("seed:x")
+
+    assert cache.get("all-page") == ["a"]
+    assert cache.invalidate_tag("a") == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_replacing_and_evicting_entries_unregisters_their_tags():
+    cache = ResultCache(max_entries=2)
+    cache.put("page-1", [1], tags={"a"})
+    cache.put("page-1", [1], tags={"b"})
+    cache.put("page-2", [2], tags={"c"})
+    cache.get("page-1")
+    cache.put("page-3", [3], tags={"d"})
+
+    assert cache.get("page-2") is None
+    assert cache.invalidate_tag("a") == 0
+    assert cache.invalidate_tag("c") == 0
+    assert set(cache.keys_by_tag) == {"b", "d"}
+
+
+def test_make_key_ignores_empty_filters_and_ordering():
+    assert ResultCache.make_key({"sort_by": "score", "cursor": None, "seed": ""}) == ResultCache.make_key({"sort_by": "score"})
+    assert ResultCache.make_key({"a": 1, "b": 2}) == ResultCache.make_key({"b": 2, "a": 1})